@@ -1,4 +1,5 @@
 from io import StringIO
+import asyncio
 import json
 import os
 from typing import Dict, Literal, Optional, Any
@@ -7,7 +8,6 @@ import sqlite3
 
 # LangChain imports
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage
-from langchain_core.prompts import PromptTemplate
 from langgraph.graph import StateGraph, END, START
 from langgraph.types import Command
 from langgraph.graph.message import MessagesState
@@ -23,8 +23,15 @@ from mcp import ClientSession
 from mcp.types import CallToolResult, TextContent
 
 # Local imports
-from src.utils.utils import token_count, read_prompt, read_file_prompt, messages_token_count, load_chat_model, get_latest_human_message, reasoning_prompt, trim_messages_to_max_tokens
-from src.db.db_query import generate_query, is_valid_query, query_summary
+from src.utils.utils import read_prompt, read_prompt_template, read_file_prompt, load_chat_model, get_latest_human_message, reasoning_prompt, trim_messages_to_max_tokens, truncate_to_tokens
+from src.db.db_query import generate_query, query_summary
+from src.db.sandbox import QuerySandbox
+from src.db.result_serializer import TSVResultSerializer, RESULTS_MAX_TOKENS
+from src.db.query_cache import QueryCache, results_schema_version
+from src.db.query_templates import match_query_template, render_query
+from src.utils.cache import LRUCache
+from src.utils import telemetry
+from src.core.intent import IntentClassifier, QUERYDB_SCORE_THRESHOLD
 
 # Custom API
 from fastapi import FastAPI, HTTPException, Request, Response, APIRouter
@@ -47,11 +54,38 @@ VALID_REPORT_CATEGORIES = {"code", "container", "aws", "kubernetes", "all"}
 from src.db.db_setup import setup_database_connections
 
 app_context = setup_database_connections()
+
+# query_summary results keyed by (category, results data version)
+summary_cache = LRUCache(
+    max_entries=int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "32")),
+    max_bytes=int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+
+# Bounded, read-only execution of generated SQL
+sandbox = QuerySandbox()
+
+# Validated SQL of previous questions, persisted in the main database
+query_cache = QueryCache()
+
+# Local intent scoring, retrained from the logged LLM decisions at startup
+intent_classifier = IntentClassifier()
+intent_classifier.train()
+
+# Opt-in: generate the SQL of a question while its intent is being classified by the LLM
+SPECULATIVE_SQL = os.getenv("SPECULATIVE_SQL", "false").lower() in ("1", "true", "yes")
+# In-flight speculative generate_query tasks keyed by thread id, as (question, category, task)
+speculative_queries = {}
+speculation_stats = {"started": 0, "used": 0, "wasted": 0}
+
+@app_context.subscribe
+def drop_stale_summaries(old_version, new_version):
+    summary_cache.discard(lambda key: key[1] != new_version)
 #-------------------------------
 # Model setup
 #-------------------------------
-model = load_chat_model()
-final_model = load_chat_model().with_config(tags=["final_node"])
+# Token usage and time to first token of every call are recorded per node (src/utils/telemetry.py)
+model = load_chat_model().with_config(callbacks=[telemetry.callback_handler])
+final_model = load_chat_model().with_config(tags=["final_node"], callbacks=[telemetry.callback_handler])
 
 #-------------------------------
 # Chainlit Authentication
@@ -69,6 +103,7 @@ class AgentState(MessagesState):
     user_query: Optional[str] = None
     sql_query: Optional[str] = None
     query_results: Optional[str] = None
+    query_truncated: Optional[bool] = None
     category: Optional[str] = None
     result_text: Optional[str] = None
     top5: Optional[str] = None
@@ -105,6 +140,53 @@ def parse_report_command(input_string: str) -> str:
         
     return argument
 
+def question_category(state) -> str:
+    """Upper-case category of the conversation, "ALL" when none was chosen."""
+    return state.get("category", "ALL").upper() if state.get("category") else "ALL"
+
+def start_speculative_query(config: RunnableConfig, question: str, category: str):
+    """
+    With SPECULATIVE_SQL, start generating the SQL of a question before its intent is known,
+    unless a query template answers it anyway.
+    """
+    if not SPECULATIVE_SQL or match_query_template(question, category) is not None:
+        return
+    thread_id = config["configurable"]["thread_id"]
+    discard_speculative_query(config)
+    # Measured as its own node: the task would otherwise add its tokens and DB time to the
+    # intent span it was started from, after that span was already recorded
+    task = asyncio.create_task(speculative_query(question, category))
+    # Retrieve the error of a task nobody awaits, instead of logging it at garbage collection
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    speculative_queries[thread_id] = (question, category, task)
+    speculation_stats["started"] += 1
+
+async def speculative_query(question: str, category: str):
+    """cached_or_generated_query run ahead of routing, recorded as the speculative_sql node."""
+    return await telemetry.instrument_node("speculative_sql", cached_or_generated_query)(question, category)
+
+def take_speculative_query(config: RunnableConfig, question: str, category: str):
+    """Return the speculative task generating the SQL of this question, if there is one."""
+    entry = speculative_queries.pop(config["configurable"]["thread_id"], None)
+    if entry is None:
+        return None
+    if entry[:2] != (question, category):
+        entry[2].cancel()
+        speculation_stats["wasted"] += 1
+        return None
+    speculation_stats["used"] += 1
+    print(f"Using speculative query: {speculation_stats}")
+    return entry[2]
+
+def discard_speculative_query(config: RunnableConfig):
+    """Cancel the speculative SQL generation of a thread; routing did not go to querydb."""
+    entry = speculative_queries.pop(config["configurable"]["thread_id"], None)
+    if entry is None:
+        return
+    entry[2].cancel()
+    speculation_stats["wasted"] += 1
+    print(f"Discarded speculative query: {speculation_stats}")
+
 def is_mcp_tool_available() -> bool:
     """
     Check if any MCP tools are available.
@@ -115,7 +197,7 @@ def is_mcp_tool_available() -> bool:
 #-------------------------------
 # Node Functions
 #-------------------------------
-async def classify_user_intent(state: AgentState):
+async def classify_user_intent(state: AgentState, config: RunnableConfig):
     """
     Classify the user's query as either a report request or a regular question.
     """
@@ -133,32 +215,47 @@ async def classify_user_intent(state: AgentState):
             goto="summary"
         )
     except ValueError:
-        # Process as a regular question
-        content = reasoning_prompt(
-            "./src/prompts/intent_classification_prompt.txt", 
-            question=query
-        )
-        intent_response = await model.ainvoke([HumanMessage(content=content)])
-        
-        try:
-            res = json.loads(intent_response.content)
-            score = res.get("Score", 0)
-            next_node = "reason"
-            if score > 30:
-                next_node = "querydb"
-            elif is_mcp_tool_available():
-                next_node = "mcp_tool"
-            return Command(
-                update={"user_query": query},
-                goto=next_node
-            )
-        except json.JSONDecodeError:
-            # Handle invalid JSON response
-            print("Failed to parse intent classification response")
-            return Command(
-                update={"user_query": query},
-                goto="mcp_tool" if is_mcp_tool_available() else "reason"
+        # Process as a regular question; obvious cases are scored locally
+        score = intent_classifier.classify(query)
+        if score is None:
+            start_speculative_query(config, query, question_category(state))
+            content = reasoning_prompt(
+                "./src/prompts/intent_classification_prompt.txt", 
+                question=query
             )
+            try:
+                intent_response = await model.ainvoke([HumanMessage(content=content)])
+            except BaseException:
+                # Includes cancellation of the run; the speculative task must not outlive it
+                discard_speculative_query(config)
+                raise
+
+            try:
+                res = json.loads(intent_response.content)
+                score = res.get("Score", 0)
+                with telemetry.db_timer():
+                    await asyncio.to_thread(intent_classifier.record, query, score)
+            except json.JSONDecodeError:
+                # Handle invalid JSON response
+                print("Failed to parse intent classification response")
+                discard_speculative_query(config)
+                return Command(
+                    update={"user_query": query},
+                    goto="mcp_tool" if is_mcp_tool_available() else "reason"
+                )
+        print(f"Intent classifier: {intent_classifier.stats()}")
+
+        next_node = "reason"
+        if score > QUERYDB_SCORE_THRESHOLD:
+            next_node = "querydb"
+        else:
+            discard_speculative_query(config)
+            if is_mcp_tool_available():
+                next_node = "mcp_tool"
+        return Command(
+            update={"user_query": query},
+            goto=next_node
+        )
         
 async def invoke_llm(state: AgentState):
     messages = state["messages"]
@@ -171,8 +268,16 @@ async def generate_summary_report(state: AgentState):
     print("--------------do_summary---------------")
     category = state["category"]
 
-    # Query database for summary data
-    summary_df, details_df = await query_summary(app_context.get_connection(), category)
+    # Query database for summary data, unless unchanged since the last report
+    cache_key = (category.upper(), app_context.data_version())
+    cached = summary_cache.get(cache_key)
+    if cached is None:
+        with app_context.read_connection() as conn:
+            cached = await query_summary(conn, category)
+        if cached[0] is not None:
+            summary_cache.put(cache_key, cached)
+    summary_df, details_df = cached
+    print(f"Summary cache: {summary_cache.stats()}")
     
     # Convert results to string format
     result = details_df.to_string(index=False)
@@ -180,11 +285,7 @@ async def generate_summary_report(state: AgentState):
     summary = summary_df.to_string(index=False)
 
     # Format prompt for the model
-    template = read_prompt("summary")
-    prompt = PromptTemplate(
-        template=template,
-        input_variables=["category", "summary", "result"]
-    )
+    prompt = read_prompt_template("summary")
     formatted_prompt = prompt.format(
         category=category, 
         summary=summary, 
@@ -197,10 +298,6 @@ async def generate_summary_report(state: AgentState):
         HumanMessage(content=formatted_prompt)
     ]
 
-    # Log token usage
-    tokens = token_count(formatted_prompt)
-    print(f"Token used: {tokens}\n")
-
     # Get response from the model
     response = await final_model.ainvoke(messages)
 
@@ -219,11 +316,7 @@ async def generate_insights(state: AgentState):
     result = state["top5"]
 
     # Format prompt for insights
-    template = read_prompt("insight")
-    prompt = PromptTemplate(
-        template=template,
-        input_variables=["result"]
-    )
+    prompt = read_prompt_template("insight")
     formatted_prompt = prompt.format(result=result)
     
     # Create messages for the model
@@ -247,16 +340,41 @@ async def finalize_conclusion(state: AgentState):
     template = read_prompt("conclude")
     messages.append(HumanMessage(content=template))
     
-    # Log token usage
-    total_tokens = messages_token_count(messages)
-    print(f"total message tokens: {total_tokens}")
-    
     # Get response from the model
     response = await final_model.ainvoke(messages)
     
     return {"messages": [HumanMessage(content=result), response]}
 
-async def execute_db_query(state: AgentState) -> Command[Literal["reason"]]:
+async def cached_or_generated_query(user_query: str, category: str):
+    """
+    Return the SQL of a question from the query cache, or generate, validate and cache it.
+    Returns (None, ()) when the generated query is invalid.
+    """
+    # Reuse the SQL of an earlier, equivalent question
+    with app_context.read_connection() as conn:
+        schema_version = results_schema_version(conn)
+        generated_query = await asyncio.to_thread(
+            query_cache.get, user_query, category, schema_version,
+            lambda sql: sandbox.validate(conn, sql)
+        )
+    print(f"Query cache: {query_cache.stats()}")
+    if generated_query is not None:
+        return generated_query, ()
+
+    # Generate a database query using the model
+    generated_query = await generate_query(user_query, category, model)
+
+    # Validate the generated query
+    if generated_query is None:
+        return None, ()
+    with app_context.read_connection() as conn:
+        if not sandbox.validate(conn, generated_query):
+            return None, ()
+    with telemetry.db_timer():
+        await asyncio.to_thread(query_cache.put, user_query, category, generated_query, schema_version)
+    return generated_query, ()
+
+async def execute_db_query(state: AgentState, config: RunnableConfig) -> Command[Literal["reason"]]:
     """
     Execute a database query based on the user's question
     """
@@ -265,30 +383,37 @@ async def execute_db_query(state: AgentState) -> Command[Literal["reason"]]:
     user_query = state["user_query"]
     
     # Determine category if available
-    category = state.get("category", "ALL").upper() if state.get("category") else "ALL"
+    category = question_category(state)
 
     try:
-        # Generate a database query using the model
-        generated_query = await generate_query(user_query, category, model)
-
-        # Validate the generated query
-        if not is_valid_query(generated_query, app_context.get_engine()):
-            print("Generated query is invalid or potentially unsafe.\n\n")
-            return Command(
-                update={"user_query": user_query},
-                goto="reason"
-            )
+        # Common question classes are answered by a prebuilt query without the model
+        template = match_query_template(user_query, category)
+        if template is not None:
+            print(f"Query template: {template.name}")
+            generated_query, params = template.sql, template.params
+        else:
+            speculative = take_speculative_query(config, user_query, category)
+            if speculative is not None:
+                generated_query, params = await speculative
+            else:
+                generated_query, params = await cached_or_generated_query(user_query, category)
+            if generated_query is None:
+                print("Generated query is invalid or potentially unsafe.\n\n")
+                return Command(
+                    update={"user_query": user_query},
+                    goto="reason"
+                )
 
         # Execute the validated query
         print("Executing query...\n\n")
-        cursor = app_context.get_connection().cursor()
-        cursor.execute(generated_query)
-        records = cursor.fetchall()
-
-        # Prepare query results
-        if records:
-            columns = [desc[0] for desc in cursor.description]
-            results_str = "\n".join(str(dict(zip(columns, row))) for row in records)
+        with app_context.read_connection() as conn:
+            # Rows are serialized for the prompt as they are fetched, up to the token budget
+            serializer = TSVResultSerializer()
+            result = await asyncio.to_thread(sandbox.execute, conn, generated_query, params, serializer)
+
+        # Prepare query results; truncated without rows means the first row was over budget
+        if result.row_count or result.truncated:
+            results_str = serializer.finish(result.truncated)
         else:
             results_str = "No results returned."
 
@@ -296,8 +421,10 @@ async def execute_db_query(state: AgentState) -> Command[Literal["reason"]]:
         return Command(
             update={
                 "user_query": user_query, 
-                "sql_query": generated_query, 
+                # Generated SQL has no parameters and may contain a literal '?'
+                "sql_query": render_query(generated_query, params) if params else generated_query, 
                 "query_results": results_str, 
+                "query_truncated": result.truncated,
                 "messages": messages + [SystemMessage(content="Query executed successfully.")]
             },
             goto="mcp_tool"
@@ -341,11 +468,7 @@ async def execute_mcp_tool(state: AgentState) -> Command[Literal["reason"]]:
         query_results = state.get("query_results", "")
     
         # Format the mcp prompt
-        template = read_prompt("mcp")
-        prompt = PromptTemplate(
-            template=template,
-            input_variables=["tools", "input", "sql_query", "scan_results"]
-        )
+        prompt = read_prompt_template("mcp")
         formatted_prompt = prompt.format(
             tools=all_tools, 
             input=user_query,
@@ -393,28 +516,21 @@ async def provide_explanation(state: AgentState):
         sql_query = state.get("sql_query", "")
         query_results = state.get("query_results", "")
         messages = state.get("messages", [])
-        tool_message = state.get("tool_message", "")
+        # MCP tool output is unbounded; give it the same token budget as the query results
+        tool_message = truncate_to_tokens(state.get("tool_message") or "", RESULTS_MAX_TOKENS)
 
         # If the user query is missing, default to the latest human message
         if not user_query:
             user_query = get_latest_human_message(state["messages"])
 
         # Format the explanation prompt
-        template = read_prompt("explanation")
-        prompt = PromptTemplate(
-            template=template,
-            input_variables=["question", "sql_query", "scan_results", "tool_message"]
-        )
+        prompt = read_prompt_template("explanation")
         formatted_prompt = prompt.format(
             question=user_query, 
             sql_query=sql_query, 
             scan_results=query_results,
             tool_message=tool_message
         )
-        
-        # Limit prompt size to prevent token overflow
-        if len(formatted_prompt) > 80000:
-            formatted_prompt = formatted_prompt[:80000]
 
         messages = trim_messages_to_max_tokens(messages)
         messages.append(HumanMessage(content=formatted_prompt))
@@ -469,14 +585,14 @@ async def provide_explanation(state: AgentState):
 
 builder = StateGraph(AgentState)
 
-builder.add_node("intent", classify_user_intent)
-builder.add_node("querydb", execute_db_query)
-builder.add_node("summary", generate_summary_report)
-builder.add_node("insight", generate_insights)
-builder.add_node("mcp_tool", execute_mcp_tool)
-builder.add_node("conclude", finalize_conclusion)
-builder.add_node("reason", provide_explanation)
-builder.add_node("report", invoke_llm)
+builder.add_node("intent", telemetry.instrument_node("intent", classify_user_intent))
+builder.add_node("querydb", telemetry.instrument_node("querydb", execute_db_query))
+builder.add_node("summary", telemetry.instrument_node("summary", generate_summary_report))
+builder.add_node("insight", telemetry.instrument_node("insight", generate_insights))
+builder.add_node("mcp_tool", telemetry.instrument_node("mcp_tool", execute_mcp_tool))
+builder.add_node("conclude", telemetry.instrument_node("conclude", finalize_conclusion))
+builder.add_node("reason", telemetry.instrument_node("reason", provide_explanation))
+builder.add_node("report", telemetry.instrument_node("report", invoke_llm))
 
 # define the node which will display the resoning result on web
 REASONING_NODE = ["reason", "report", "summary", "insight", "assessment", "remediation", "effort", "conclude"]
@@ -493,6 +609,150 @@ graph = builder.compile(
 checkpointer=checkpointer
 )
 
+#-------------------------------
+# Report cache
+#-------------------------------
+# Finished /report answers keyed by (category, results data version)
+report_cache = LRUCache(
+    max_entries=int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "32")),
+    max_bytes=int(os.getenv("REPORT_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+)
+
+# Generate the starter reports in the background whenever the results change
+REPORT_PREGENERATE = os.getenv("REPORT_PREGENERATE", "true").lower() in ("1", "true", "yes")
+STARTER_REPORT_CATEGORIES = ["all", "kubernetes", "aws", "code", "container"]
+
+# State written by a /report run besides its messages
+REPORT_STATE_KEYS = ("category", "dataframe", "result_text", "top5")
+
+# Reports being generated, so a request for the same report waits instead of generating it twice
+pending_reports = {}
+pregeneration_task = None
+
+def report_cache_key(content: str):
+    """Return the report cache key of a /report command, or None for other messages."""
+    try:
+        category = parse_report_command(content)
+    except ValueError:
+        return None
+    return (category, app_context.data_version())
+
+async def graph_events(content: str, config: dict):
+    """
+    Run the graph on a user message and yield what is displayed: ("token", text) for
+    streamed answer text and ("table", csv) for the report table.
+    """
+    try:
+        async for msg, metadata in graph.astream({"messages": [HumanMessage(content=content)]}, stream_mode="messages", config=RunnableConfig(callbacks=[], **config)):
+            if (
+                msg.content
+                and not isinstance(msg, HumanMessage)
+                and not isinstance(msg, SystemMessage)
+                and metadata["langgraph_node"] in REASONING_NODE
+            ):
+                yield "token", msg.content
+
+            if (
+                "finish_reason" in msg.response_metadata
+                and msg.response_metadata["finish_reason"] == "stop"
+            ):
+                yield "token", "\n\n"
+
+            # Hack print report by dataframe
+            if (
+                "finish_reason" in msg.response_metadata
+                and msg.response_metadata["finish_reason"] == "stop"
+                and metadata["langgraph_node"] in ["insight"]
+            ):
+                state = graph.get_state(config=config)
+                yield "table", state.values["dataframe"]
+    finally:
+        # A run that failed or stopped between intent and querydb leaves its speculative
+        # query behind; querydb and the other routes have already taken or discarded it
+        discard_speculative_query(config)
+
+async def generate_report(content: str, key: tuple, config: dict, on_event=None):
+    """
+    Generate a report through the graph and cache it under ``key`` once complete.
+    ``on_event`` is awaited with every display event, as yielded by graph_events.
+    """
+    report = {"markdown": "", "table_offset": None, "table_csv": None, "state": None}
+    done = asyncio.get_running_loop().create_future()
+    pending_reports[key] = done
+    try:
+        messages_before = len(graph.get_state(config).values.get("messages", []))
+        async for kind, payload in graph_events(content, config):
+            if kind == "token":
+                report["markdown"] += payload
+            else:
+                report["table_offset"] = len(report["markdown"])
+                report["table_csv"] = payload
+            if on_event:
+                await on_event(kind, payload)
+        # What the run wrote to its thread, so a replay leaves another thread in the same state
+        values = graph.get_state(config).values
+        report["state"] = {name: values.get(name) for name in REPORT_STATE_KEYS}
+        report["state"]["messages"] = values.get("messages", [])[messages_before:]
+        report_cache.put(key, report)
+        return report
+    finally:
+        pending_reports.pop(key, None)
+        done.set_result(None)
+
+async def send_report_table(df_str: str):
+    df = pd.read_csv(StringIO(df_str))
+    elements = [cl.Dataframe(data=df, display="inline", name="Dataframe")]
+    await cl.Message(content="Report Table:", elements=elements).send()
+
+async def replay_report(report: dict):
+    """Send a cached report the way it was displayed when generated."""
+    final_answer = cl.Message(content="")
+    offset = report["table_offset"] if report["table_csv"] is not None else len(report["markdown"])
+    await final_answer.stream_token(report["markdown"][:offset])
+    if report["table_csv"] is not None:
+        await send_report_table(report["table_csv"])
+    await final_answer.stream_token(report["markdown"][offset:])
+    await final_answer.send()
+
+def replay_report_state(config: dict, report: dict):
+    """Write the state of a cached report run into a thread, as if it had run there."""
+    state = dict(report["state"])
+    # New message ids, so replaying the same report twice in a thread appends it twice
+    state["messages"] = [message.model_copy(update={"id": None}) for message in state["messages"]]
+    graph.update_state(config, state, as_node="conclude")
+
+async def pregenerate_reports(version):
+    """Generate the starter reports of a data version that are not cached yet."""
+    for category in STARTER_REPORT_CATEGORIES:
+        if app_context.data_version() != version:
+            # Superseded by a newer import
+            return
+        key = (category, version)
+        if key in report_cache or key in pending_reports:
+            continue
+        print(f"Pre-generating /report {category} for data version {version}")
+        thread_id = f"report-pregeneration-{category}"
+        try:
+            await generate_report(f"/report {category}", key, {"configurable": {"thread_id": thread_id}})
+        except Exception as e:
+            print(f"Error pre-generating /report {category}: {e}")
+        finally:
+            # The cached report keeps what replays need; drop the checkpoints
+            checkpointer.delete_thread(thread_id)
+
+def schedule_report_pregeneration(version):
+    global pregeneration_task
+    if not REPORT_PREGENERATE:
+        return
+    if pregeneration_task is not None and not pregeneration_task.done():
+        pregeneration_task.cancel()
+    pregeneration_task = asyncio.get_running_loop().create_task(pregenerate_reports(version))
+
+@app_context.subscribe
+def refresh_reports(old_version, new_version):
+    report_cache.discard(lambda key: key[1] != new_version)
+    schedule_report_pregeneration(new_version)
+
 #-------------------------------
 # chainlit workflow
 #-------------------------------
@@ -500,6 +760,10 @@ checkpointer=checkpointer
 @cl.on_chat_start
 async def on_chat_start():
     cl.user_session.set("chat_history",[])
+    # Follow results imports from now on
+    app_context.start_watcher()
+    if pregeneration_task is None:
+        schedule_report_pregeneration(app_context.data_version())
 
 @cl.on_message
 async def on_message(msg: cl.Message):
@@ -507,35 +771,29 @@ async def on_message(msg: cl.Message):
     chat_history.append({"role": "user", "content": msg.content})
     config = {"configurable": {"thread_id": msg.thread_id}}
 
-    cb = cl.LangchainCallbackHandler()
+    key = report_cache_key(msg.content)
+    if key is not None:
+        if key in pending_reports:
+            await asyncio.shield(pending_reports[key])
+        report = report_cache.get(key)
+        if report is not None:
+            await replay_report(report)
+            replay_report_state(config, report)
+            return
+
     final_answer = cl.Message(content="")
-    
-    async for msg, metadata in graph.astream({"messages": [HumanMessage(content=msg.content)]}, stream_mode="messages", config=RunnableConfig(callbacks=[], **config)):
-        if (
-            msg.content
-            and not isinstance(msg, HumanMessage)
-            and not isinstance(msg, SystemMessage)
-            and metadata["langgraph_node"] in REASONING_NODE
-        ):
-            await final_answer.stream_token(msg.content)
-
-        if (
-            "finish_reason" in msg.response_metadata
-            and msg.response_metadata["finish_reason"] == "stop"
-        ):
-            await final_answer.stream_token("\n\n")
-
-        # Hack print report by dataframe
-        if (
-            "finish_reason" in msg.response_metadata
-            and msg.response_metadata["finish_reason"] == "stop"
-            and metadata["langgraph_node"] in ["insight"]
-        ):
-            state = graph.get_state(config=config)
-            df_str = state.values["dataframe"]
-            df = pd.read_csv(StringIO(df_str))
-            elements = [cl.Dataframe(data=df, display="inline", name="Dataframe")]
-            await cl.Message(content="Report Table:", elements=elements).send()
+
+    async def display(kind, payload):
+        if kind == "token":
+            await final_answer.stream_token(payload)
+        else:
+            await send_report_table(payload)
+
+    if key is not None:
+        await generate_report(msg.content, key, config, display)
+    else:
+        async for kind, payload in graph_events(msg.content, config):
+            await display(kind, payload)
 
     await final_answer.send()
 
@@ -655,6 +913,17 @@ async def serve_blob_file(
     
     return Response(content=file_data, media_type="application/octet-stream")
 
+telemetry.register_collector("intent", intent_classifier.stats)
+telemetry.register_collector("speculation", lambda: speculation_stats)
+telemetry.register_collector("query_cache", query_cache.stats)
+telemetry.register_collector("summary_cache", summary_cache.stats)
+telemetry.register_collector("report_cache", report_cache.stats)
+
+@cust_router.get("/metrics")
+async def serve_metrics():
+    """Per-node latency and token telemetry, and cache statistics, in Prometheus text format"""
+    return Response(content=telemetry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 serve_route: list[BaseRoute] = [
     r for r in app.router.routes if isinstance(r, Route) and r.name == "serve"
 ]
@@ -0,0 +1,187 @@
+import math
+import os
+import re
+import sqlite3
+import time
+from collections import Counter
+
+from src.db.config import DEFAULT_DB_PATH, INTENT_DECISIONS_TABLE_SCHEMA
+from src.db.engine import connect
+from src.db.query_templates import match_query_template
+
+# Local scoring of the intent classification. Questions that are obviously about the scan
+# results (or obviously not) are routed without an LLM call; only scores inside the
+# uncertainty band between INTENT_LOCAL_LOW and INTENT_LOCAL_HIGH are sent to the model.
+
+# Score above which a question is routed to querydb (same scale as intent_classification_prompt)
+QUERYDB_SCORE_THRESHOLD = 30
+# Local scores at or outside these bounds are trusted without asking the LLM
+INTENT_LOCAL_LOW = float(os.getenv("INTENT_LOCAL_LOW", "10"))
+INTENT_LOCAL_HIGH = float(os.getenv("INTENT_LOCAL_HIGH", "85"))
+# Logged LLM decisions needed before they replace the built-in keyword weights
+INTENT_MIN_TRAINING_SAMPLES = int(os.getenv("INTENT_MIN_TRAINING_SAMPLES", "200"))
+# Most recent logged decisions used for training
+INTENT_MAX_TRAINING_SAMPLES = int(os.getenv("INTENT_MAX_TRAINING_SAMPLES", "5000"))
+
+# Log-odds added when a query template matches the question; a hint, not a decision
+TEMPLATE_MATCH_BOOST = 2.0
+
+# Built-in weights (log-odds of needing a database query) for words and word pairs
+SEED_BIAS = -0.5
+SEED_WEIGHTS = {
+    # Ranking, listing and counting the scan results
+    "top": 2.5, "highest": 2.0, "most": 1.0, "riskiest": 2.5, "prioritize": 2.0, "prioritise": 2.0,
+    "list": 2.0, "show": 1.5, "which": 1.5, "count": 2.0, "how many": 2.5, "number": 1.0,
+    "summary": 1.5, "summarize": 1.5, "overview": 1.5, "breakdown": 2.0,
+    # Result columns and values
+    "severity": 1.5, "critical": 1.5, "high": 1.0, "medium": 1.0, "low": 0.5, "risk": 1.0, "score": 1.0,
+    "vulnerabilities": 1.5, "vulnerability": 1.0, "misconfigurations": 1.5, "misconfiguration": 1.0,
+    "issues": 1.5, "findings": 1.5, "cve": 2.0, "cves": 2.0, "resources": 1.5, "resource": 1.0,
+    "affected": 1.5, "packages": 1.0, "images": 1.0, "pods": 1.0, "buckets": 1.0, "roles": 1.0,
+    "my": 1.0, "our": 1.0, "scan": 1.5, "scanned": 2.0,
+    "aws": 1.0, "kubernetes": 1.0, "k8s": 1.0, "container": 0.5, "containers": 1.0, "code": 0.5,
+    # General knowledge, explanations and follow-ups
+    "what is": -2.0, "what are": -0.5, "what does": -2.0, "explain": -2.0, "why": -1.5,
+    "how do": -1.5, "how to": -1.5, "how can": -1.0, "define": -2.5, "definition": -2.5,
+    "meaning": -2.0, "mean": -1.5, "difference": -1.5, "clarify": -2.5, "example": -1.0,
+    "best practice": -1.5, "best practices": -1.5, "thanks": -3.0, "thank": -3.0,
+    "hello": -3.0, "hi": -3.0, "you": -0.5, "it": -0.5, "that": -0.5, "this": -0.5,
+}
+
+def tokenize(question: str):
+    """Lower case words and adjacent word pairs of a question."""
+    words = re.findall(r"[a-z0-9]+", question.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def _sigmoid(x: float) -> float:
+    if x < -50:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(-x))
+
+class IntentClassifier:
+    """
+    Keyword scorer estimating, like intent_classification_prompt.txt, how likely (0-100)
+    a question is answered from the results table. Starts from SEED_WEIGHTS and is
+    retrained as a naive Bayes log-odds model from the decisions the LLM made on earlier
+    questions once enough of them are logged.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, low: float = INTENT_LOCAL_LOW, high: float = INTENT_LOCAL_HIGH):
+        self.db_path = db_path
+        self.low = low
+        self.high = high
+        self.bias = SEED_BIAS
+        self.weights = dict(SEED_WEIGHTS)
+        self.training_samples = 0
+        self.local_decisions = 0
+        self.llm_decisions = 0
+        try:
+            conn = connect(self.db_path)
+            try:
+                conn.executescript(INTENT_DECISIONS_TABLE_SCHEMA)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error initializing intent decisions: {e}")
+
+    def score(self, question: str) -> float:
+        """Local likelihood score (0-100) that the question needs a database query."""
+        logit = self.bias + sum(self.weights.get(token, 0.0) for token in tokenize(question))
+        if match_query_template(question) is not None:
+            # Has the shape of a question answered by a prebuilt query (src/db/query_templates.py)
+            logit += TEMPLATE_MATCH_BOOST
+        return round(100.0 * _sigmoid(logit), 1)
+
+    def classify(self, question: str):
+        """
+        Score a question locally.
+
+        Args:
+            question (str): The user question.
+
+        Returns:
+            float: The local score, or None when it falls inside the uncertainty band and
+            the LLM has to be consulted.
+        """
+        score = self.score(question)
+        if score <= self.low or score >= self.high:
+            self.local_decisions += 1
+            print(f"Intent score {score} (local)")
+            return score
+        # Counted here, so consultations whose answer cannot be parsed are included
+        self.llm_decisions += 1
+        print(f"Intent score {score} uncertain, asking the model")
+        return None
+
+    def record(self, question: str, score: float, source: str = "llm"):
+        """Log the decision of the LLM on a question as training data."""
+        try:
+            conn = connect(self.db_path)
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT INTO intent_decisions (question, score, source, created_at) VALUES (?, ?, ?, ?)",
+                        (question, float(score), source, time.time())
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error logging intent decision: {e}")
+
+    def train(self) -> int:
+        """
+        Refit the weights from the logged LLM decisions. The built-in weights are kept
+        until INTENT_MIN_TRAINING_SAMPLES decisions of both outcomes are available.
+
+        Returns:
+            int: Number of decisions trained on, 0 when the built-in weights are kept.
+        """
+        try:
+            conn = connect(self.db_path, read_only=True)
+            try:
+                rows = conn.execute(
+                    "SELECT question, score FROM intent_decisions WHERE source = 'llm' ORDER BY created_at DESC LIMIT ?",
+                    (INTENT_MAX_TRAINING_SAMPLES,)
+                ).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error reading intent decisions: {e}")
+            return 0
+
+        positive, negative = Counter(), Counter()
+        positive_count = negative_count = 0
+        for question, score in rows:
+            tokens = set(tokenize(question or ""))
+            if score > QUERYDB_SCORE_THRESHOLD:
+                positive.update(tokens)
+                positive_count += 1
+            else:
+                negative.update(tokens)
+                negative_count += 1
+        if len(rows) < INTENT_MIN_TRAINING_SAMPLES or not positive_count or not negative_count:
+            return 0
+
+        # Bernoulli naive Bayes log-likelihood ratios with Laplace smoothing; only the words
+        # present in a question contribute, absent words are folded into the bias
+        weights = {}
+        bias = math.log(positive_count / negative_count)
+        for token in positive.keys() | negative.keys():
+            p = (positive[token] + 1) / (positive_count + 2)
+            q = (negative[token] + 1) / (negative_count + 2)
+            weights[token] = math.log(p / q) - math.log((1 - p) / (1 - q))
+            bias += math.log((1 - p) / (1 - q))
+        self.weights, self.bias = weights, bias
+        self.training_samples = len(rows)
+        print(f"Intent classifier trained on {len(rows)} decisions")
+        return len(rows)
+
+    def stats(self) -> dict:
+        """Counters for logging and metrics."""
+        total = self.local_decisions + self.llm_decisions
+        return {
+            "local": self.local_decisions,
+            "llm": self.llm_decisions,
+            "local_rate": self.local_decisions / total if total else 0.0,
+            "training_samples": self.training_samples,
+        }
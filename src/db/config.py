@@ -20,6 +20,96 @@ CREATE TABLE IF NOT EXISTS results (
 );
 """
 
+# Secondary indexes of the results table, by name. Managed by src/db/db_index.py: created
+# idempotently at init, and indexes with the idx_results_ prefix missing here are dropped.
+RESULTS_TABLE_INDEXES = {
+    # Per-type filters and the type/severity rollup, ordered by score
+    "idx_results_type_severity": "results (type, severity, risk_score)",
+    # Lookups of one check across resources
+    "idx_results_avdid": "results (avdid)",
+    # AWS questions filtering by service
+    "idx_results_service_name": "results (service_name, type)",
+    # Top-N by score across all types
+    "idx_results_risk_score": "results (risk_score DESC)",
+    # No index for the summary GROUP BY: it runs once per import to fill results_summary.
+    # Skipping the sort needs title and description in the key, which nearly doubles the
+    # file; without them SQLite sorts anyway and the index buys nothing.
+}
+
+# Report summaries precomputed from the results table at import time (src/db/db_summary.py):
+# one row per issue group of the summary query, and the per type/severity rollup
+RESULTS_SUMMARY_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results_summary (
+    "row_id" INTEGER PRIMARY KEY,
+    "id" TEXT,
+    "type" TEXT,
+    "avdid" TEXT,
+    "description" TEXT,
+    "resolution" TEXT,
+    "severity" TEXT,
+    "risk_score" REAL,
+    "resource_count" INTEGER,
+    "resource_names" TEXT
+);
+
+CREATE TABLE IF NOT EXISTS results_type_summary (
+    "type" TEXT,
+    "severity" TEXT,
+    "total_resource_count" INTEGER,
+    "issue_count" INTEGER,
+    PRIMARY KEY (type, severity)
+);
+"""
+
+# Cache of LLM generated CVSS vectors, keyed by a hash of avdid, prompt template and model
+CVSS_CACHE_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cvss_cache (
+    "cache_key" TEXT PRIMARY KEY,
+    "avdid" TEXT,
+    "prompt_version" TEXT,
+    "model_name" TEXT,
+    "cvss_strings" TEXT,
+    "risk_score" REAL,
+    "created_at" TEXT
+);
+"""
+
+# Cache of LLM generated SQL that passed validation, keyed by a hash of the normalized
+# question and category (src/db/query_cache.py)
+QUERY_CACHE_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_cache (
+    "cache_key" TEXT PRIMARY KEY,
+    "question" TEXT,
+    "category" TEXT,
+    "sql" TEXT,
+    "schema_version" TEXT,
+    "hits" INTEGER NOT NULL DEFAULT 0,
+    "created_at" REAL,
+    "last_used_at" REAL
+);
+"""
+
+# Intent scores of user questions, logged by src/core/intent.py whenever the LLM
+# classified a question; the local classifier is trained from them
+INTENT_DECISIONS_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS intent_decisions (
+    "question" TEXT,
+    "score" REAL,
+    "source" TEXT,
+    "created_at" REAL
+);
+"""
+
+# Monotonic version counters bumped by every write to a data set (e.g. a results import),
+# so readers can detect changes without watching the database file
+DATA_VERSION_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS data_version (
+    "name" TEXT PRIMARY KEY,
+    "version" INTEGER NOT NULL,
+    "updated_at" TEXT
+);
+"""
+
 CHAT_HISTORY_TABLE_SCHEMA = """
 CREATE TABLE users (
     "id" UUID PRIMARY KEY,
@@ -218,3 +308,7 @@ SAMPLE_DATA = [
 
 # Default database path
 DEFAULT_DB_PATH = os.getenv("DEFAULT_DB_PATH", "/sqlite/chainlit.db")
+
+# Database holding the results table. Defaults to the chat database; a dedicated file lets
+# shadow imports swap the whole file instead of copying the rows over.
+RESULTS_DB_PATH = os.getenv("RESULTS_DB_PATH", DEFAULT_DB_PATH)
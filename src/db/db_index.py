@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+import argparse
+import os
+import sys
+
+# Add the parent directory to sys.path to be able to import from src
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.db.config import RESULTS_DB_PATH, RESULTS_TABLE_INDEXES
+from src.db.engine import connect
+
+# Indexes with this prefix are owned by RESULTS_TABLE_INDEXES
+MANAGED_INDEX_PREFIX = "idx_results_"
+
+def ensure_results_indexes(conn) -> list[str]:
+    """
+    Bring the secondary indexes of the results table in line with RESULTS_TABLE_INDEXES:
+    create the declared ones that are missing, rebuild those whose definition changed and
+    drop managed ones no longer declared.
+
+    Args:
+        conn (sqlite3.Connection): A writable database connection.
+
+    Returns:
+        list[str]: Names of the created, rebuilt and dropped indexes.
+    """
+    existing = dict(conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'results' AND name LIKE ?",
+        (f"{MANAGED_INDEX_PREFIX}%",)
+    ).fetchall())
+    changed = []
+    for name, definition in RESULTS_TABLE_INDEXES.items():
+        # SQLite keeps the CREATE statement without IF NOT EXISTS
+        statement = f"CREATE INDEX {name} ON {definition}"
+        if existing.get(name) == statement:
+            continue
+        if name in existing:
+            conn.execute(f"DROP INDEX {name}")
+        conn.execute(statement)
+        changed.append(name)
+    for name in set(existing) - set(RESULTS_TABLE_INDEXES):
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+        changed.append(name)
+    conn.commit()
+    return changed
+
+def ensure_results_indexes_at(db_path: str = RESULTS_DB_PATH) -> list[str]:
+    """Open a database file and run ensure_results_indexes on it."""
+    conn = connect(db_path)
+    try:
+        return ensure_results_indexes(conn)
+    finally:
+        conn.close()
+
+def optimize_results_db(conn, analyze: bool = True):
+    """
+    Refresh the planner statistics after the results table was rewritten.
+
+    Args:
+        conn (sqlite3.Connection): A writable database connection.
+        analyze (bool): Run a full ANALYZE of the results table before PRAGMA optimize.
+    """
+    if analyze:
+        conn.execute("ANALYZE results")
+    conn.execute("PRAGMA optimize")
+    conn.commit()
+
+def optimize_results_db_at(db_path: str = RESULTS_DB_PATH, analyze: bool = True):
+    """Open a database file and run optimize_results_db on it."""
+    conn = connect(db_path)
+    try:
+        optimize_results_db(conn, analyze)
+    finally:
+        conn.close()
+
+def canonical_queries():
+    """
+    Return the queries the app runs against the results table, as (name, sql, params).
+    """
+    from src.db.db_summary import summary_query
+
+    return [
+        ("summary all", *summary_query("ALL")),
+        ("summary by type", *summary_query("KUBERNETES")),
+        ("type/severity rollup", "SELECT type, severity, COUNT(*) FROM results GROUP BY type, severity", ()),
+        ("issues of a check", "SELECT resource_name, message FROM results WHERE avdid = ?", ("AVD-KSV-0001",)),
+        ("aws service issues", "SELECT id, title, resource_name FROM results WHERE type = 'AWS' AND service_name = ? ORDER BY risk_score DESC", ("s3",)),
+        ("severity filter", "SELECT id, title, resource_name FROM results WHERE type = ? AND severity = ? ORDER BY risk_score DESC", ("KUBERNETES", "HIGH")),
+        ("top risks", "SELECT id, title, resource_name, risk_score FROM results ORDER BY risk_score DESC LIMIT 10", ()),
+    ]
+
+def explain_query_plan(conn, query: str, params=()) -> list[str]:
+    """
+    Return the EXPLAIN QUERY PLAN of a query as indented lines.
+
+    Args:
+        conn (sqlite3.Connection): A database connection.
+        query (str): The SQL query.
+        params (tuple): Query parameters.
+    """
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    depth = {0: 0}
+    lines = []
+    for node_id, parent_id, _, detail in rows:
+        depth[node_id] = depth.get(parent_id, 0) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Manage the results table indexes and print the query plans of the canonical queries."
+    )
+    parser.add_argument("db_path", type=str, nargs="?", default=RESULTS_DB_PATH, help="Path to the database")
+    parser.add_argument("--create", action="store_true", help="Create missing indexes and drop stale ones first")
+    parser.add_argument("--analyze", action="store_true", help="Run ANALYZE and PRAGMA optimize first")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        print(f"Database file not found at {args.db_path}")
+        return 1
+
+    conn = connect(args.db_path)
+    try:
+        if args.create:
+            changed = ensure_results_indexes(conn)
+            print(f"Updated indexes: {', '.join(changed) if changed else 'none'}")
+        if args.analyze:
+            optimize_results_db(conn)
+            print("Planner statistics refreshed")
+        for name, query, params in canonical_queries():
+            print(f"\n{name}:")
+            print("\n".join(explain_query_plan(conn, query, params)))
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,13 +5,14 @@ import os
 import asyncio
 import logging
 import datetime
-from src.db.config import DEFAULT_DB_PATH
+from src.db.config import RESULTS_DB_PATH, DATA_VERSION_TABLE_SCHEMA
 
 # Add the parent directory to sys.path to be able to import from src
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from sqlalchemy import text
-from src.db.db_util import AsyncSessionLocal, engine
+from src.db.engine import get_async_sessionmaker
+from src.db.db_util import BUMP_DATA_VERSION_SQL
 
 # Configure logging
 logging.basicConfig(
@@ -40,11 +41,14 @@ async def refresh_database(db_path, force=False):
     logger.info(f"Starting database refresh at {start_time_str}")
 
     try:
-        async with AsyncSessionLocal() as session:
+        async with get_async_sessionmaker(db_path)() as session:
             async with session.begin():
                 delete_stmt = text("DELETE FROM results")
                 await session.execute(delete_stmt)
                 logger.info("Deleted all records from 'results' table.")
+                # Let running chat apps know the results changed
+                await session.execute(text(DATA_VERSION_TABLE_SCHEMA))
+                await session.execute(text(BUMP_DATA_VERSION_SQL), {"name": "results", "updated_at": start_time_str})
             await session.commit()
 
         end_time_str = datetime.datetime.now().isoformat()
@@ -65,7 +69,7 @@ async def async_main():
         "db_path",
         type=str,
         nargs="?",
-        default=DEFAULT_DB_PATH,
+        default=RESULTS_DB_PATH,
         help="Path to the database"
     )
     parser.add_argument(
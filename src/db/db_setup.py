@@ -1,51 +1,141 @@
+import asyncio
+import inspect
 import os
 import sqlite3
-from sqlalchemy import create_engine
+from contextlib import contextmanager
 
 import chainlit.data as cl_data
 from chainlit.data.sql_alchemy import SQLAlchemyDataLayer
 from chainlit.logger import logger
 from src.db.sqlite_storage import SQLiteStorageClient
-from src.db.config import DEFAULT_DB_PATH
+from src.db.config import DEFAULT_DB_PATH, RESULTS_DB_PATH
+from src.db.engine import get_read_pool
+from src.db.db_util import read_data_version
+from src.db.db_shadow import retire_results_db
+from src.utils.telemetry import db_timer
+
+# Seconds between two checks of the results data version
+DATA_VERSION_POLL_SECONDS = float(os.getenv("DATA_VERSION_POLL_SECONDS", "2"))
 
 class AppContext:
     def __init__(self):
         self.storage_client = None
-        self.conn = None
-        self.engine = None
-        self.db_path = DEFAULT_DB_PATH
-        self._last_modified = None
+        self.db_path = RESULTS_DB_PATH
+        self.read_pool = get_read_pool(self.db_path)
+        self._db_identity = None
+        self._db_real_path = None
+        # Real paths of database files replaced by a shadow import, deleted once unused
+        self._retired = []
+        self._data_version = None
+        self._listeners = []
+        self._watcher = None
 
-    def check_and_reconnect(self):
-        """Check if database file has been modified and reconnect if needed"""
+    def connect(self):
+        """Check the results database once and read its data version through the read pool"""
+        if self._db_identity is not None:
+            return True
         try:
             if not os.path.exists(self.db_path):
                 logger.error(f"Database file not found: {self.db_path}")
                 return False
-            
-            current_modified = os.path.getmtime(self.db_path)
-            if self._last_modified != current_modified:
-                # Close existing connection if it exists
-                if self.conn:
-                    self.conn.close()
-                
-                # Reconnect
-                self.conn = sqlite3.connect(self.db_path)
-                self.engine = create_engine(f"sqlite:///{self.db_path}")
-                self._last_modified = current_modified
-                return True
-            return False
+            identity = self._file_identity()
+            self._db_real_path = os.path.realpath(self.db_path)
+            self._data_version = self._read_data_version()
+            self._db_identity = identity
+            return True
         except (sqlite3.Error, OSError) as e:
-            logger.error(f"Database reconnection error: {e}")
+            logger.error(f"Database connection error: {e}")
             return False
 
-    def get_connection(self):
-        self.check_and_reconnect()
-        return self.conn
-    
-    def get_engine(self):
-        self.check_and_reconnect()
-        return self.engine
+    def _file_identity(self):
+        stat = os.stat(self.db_path)
+        return stat.st_dev, stat.st_ino
+
+    def _reopen_if_replaced(self):
+        """Move to a new database file swapped in by a shadow import; in-flight readers finish on the old one"""
+        try:
+            identity = self._file_identity()
+        except OSError:
+            return
+        if identity == self._db_identity:
+            return
+        logger.info(f"Results database replaced, reopening {self.db_path}")
+        self._db_identity = identity
+        self._retired.append(self._db_real_path)
+        self._db_real_path = os.path.realpath(self.db_path)
+        self.read_pool.reset()
+
+    def _remove_retired(self):
+        """Delete the replaced database files once no pooled reader uses them any more"""
+        if not self._retired or self.read_pool.draining():
+            return
+        retired, self._retired = self._retired, []
+        for path in retired:
+            try:
+                retire_results_db(path, self.db_path)
+                logger.info(f"Removed replaced results database {path}")
+            except OSError as e:
+                logger.error(f"Error removing replaced results database {path}: {e}")
+
+    @contextmanager
+    def read_connection(self):
+        """Borrow a read-only connection from the pool for the duration of one request"""
+        self.connect()
+        with db_timer(), self.read_pool.acquire() as conn:
+            yield conn
+
+    def data_version(self):
+        """Return the last seen version of the results data"""
+        self.connect()
+        return self._data_version
+
+    def subscribe(self, listener):
+        """
+        Register a listener called as listener(old_version, new_version) when the results change.
+        Listeners may be plain functions or coroutine functions.
+        """
+        self._listeners.append(listener)
+        return listener
+
+    async def check_for_changes(self):
+        """Read the results data version and notify the listeners if it moved"""
+        if not self.connect():
+            return False
+        try:
+            self._reopen_if_replaced()
+            await asyncio.to_thread(self._remove_retired)
+            current = await asyncio.to_thread(self._read_data_version)
+        except sqlite3.Error as e:
+            logger.error(f"Error reading data version: {e}")
+            return False
+        previous = self._data_version
+        if current == previous:
+            return False
+        self._data_version = current
+        logger.info(f"Results changed: data version {previous} -> {current}")
+        for listener in list(self._listeners):
+            try:
+                result = listener(previous, current)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Results change listener failed: {e}")
+        return True
+
+    def _read_data_version(self):
+        with self.read_pool.acquire() as conn:
+            return read_data_version(conn)
+
+    async def _watch(self, interval):
+        while True:
+            await self.check_for_changes()
+            await asyncio.sleep(interval)
+
+    def start_watcher(self, interval=DATA_VERSION_POLL_SECONDS):
+        """Start polling the data version in the running event loop, once per process"""
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.get_running_loop().create_task(self._watch(interval))
+        return self._watcher
 
 def setup_database_connections():
     """
@@ -54,11 +144,11 @@ def setup_database_connections():
 
     app_context = AppContext()
     # Initial connection
-    app_context.check_and_reconnect()
+    app_context.connect()
 
-    # SQLite setup
-    conn_str = f"sqlite+aiosqlite:///{app_context.db_path}"
-    app_context.storage_client = SQLiteStorageClient(database_path=app_context.db_path)
+    # SQLite setup; chat history and files stay in the main database
+    conn_str = f"sqlite+aiosqlite:///{DEFAULT_DB_PATH}"
+    app_context.storage_client = SQLiteStorageClient(database_path=DEFAULT_DB_PATH)
     
     # Set up data layer
     logger.info(f"Using database connection: {conn_str}")
@@ -0,0 +1,179 @@
+import glob
+import os
+import time
+
+from src.db.config import DEFAULT_DB_PATH, RESULTS_DB_PATH
+from src.db.db_util import Base, Results, ResultsSummary, ResultsTypeSummary, DataVersion, RESULTS_COLUMNS, ensure_directory_exists, read_data_version
+from src.db.engine import connect, get_async_engine, dispose_engines
+from src.db.db_index import ensure_results_indexes, optimize_results_db
+from src.db.db_summary import refresh_results_summaries
+
+# Shadow imports build the complete results table in a separate database file and only
+# then make it live, so readers never see an empty or partially imported table.
+#
+# With a dedicated results database (RESULTS_DB_PATH != DEFAULT_DB_PATH) every import
+# writes a new generation file next to RESULTS_DB_PATH, which becomes a symlink that is
+# atomically renamed to point at the newest generation. Renaming a symlink, rather than
+# the database file itself, keeps the -wal/-shm files of the old and new generations apart
+# while readers still have the old one open. The swap leaves the previous generation in
+# place: the chat app deletes it (retire_results_db) once it reopened the new one and its
+# readers are done, and the next swap deletes any generation older than that.
+#
+# When the results share the chat database, the file cannot be replaced. This is NOT a
+# swap: the rows are copied from the shadow file into the live table in place (DELETE and
+# INSERT in a single transaction). Readers still never see a partial table, but the live
+# file grows and the copy holds the write lock; use a dedicated RESULTS_DB_PATH to swap.
+
+def is_dedicated_results_db(results_path: str = RESULTS_DB_PATH, main_path: str = DEFAULT_DB_PATH) -> bool:
+    """Return whether the results live in their own database file."""
+    return os.path.abspath(results_path) != os.path.abspath(main_path)
+
+def shadow_db_path(live_path: str = RESULTS_DB_PATH) -> str:
+    """Return a new, unique shadow file path next to the live database."""
+    root, ext = os.path.splitext(live_path)
+    return f"{root}.{time.time_ns()}{ext or '.db'}"
+
+def remove_db_files(db_path: str):
+    """Delete a database file together with its journal, WAL and shared-memory files."""
+    for path in (db_path, f"{db_path}-journal", f"{db_path}-wal", f"{db_path}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+def generation_paths(live_path: str = RESULTS_DB_PATH) -> list[str]:
+    """Generation and shadow files next to the live database, oldest first."""
+    root, ext = os.path.splitext(live_path)
+    ext = ext or ".db"
+    paths = []
+    for path in glob.glob(f"{glob.escape(root)}.*{ext}"):
+        stamp = path[len(root) + 1:-len(ext)]
+        if stamp.isdigit():
+            paths.append((int(stamp), path))
+    return [path for _, path in sorted(paths)]
+
+def retire_results_db(db_path: str, live_path: str = RESULTS_DB_PATH):
+    """
+    Delete a results database file that no reader uses any more. When it is the regular
+    file the first swap replaced with a symlink, only its orphaned journal, WAL and
+    shared-memory files are left to delete.
+
+    Args:
+        db_path (str): Real path of the retired database file
+        live_path (str): Path to the live results database file
+    """
+    if os.path.abspath(db_path) == os.path.abspath(live_path):
+        if os.path.islink(live_path):
+            for path in (f"{db_path}-journal", f"{db_path}-wal", f"{db_path}-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+        return
+    if os.path.abspath(db_path) != os.path.realpath(live_path):
+        remove_db_files(db_path)
+
+async def prepare_shadow_db(live_path: str = RESULTS_DB_PATH) -> str:
+    """
+    Create an empty shadow results database continuing the data version of the live one.
+
+    Args:
+        live_path (str): Path to the live results database file
+
+    Returns:
+        str: Path to the shadow database file.
+    """
+    shadow_path = shadow_db_path(live_path)
+    ensure_directory_exists(shadow_path)
+    remove_db_files(shadow_path)
+
+    async with get_async_engine(shadow_path).begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[Results.__table__, ResultsSummary.__table__, ResultsTypeSummary.__table__, DataVersion.__table__])
+
+    version = 0
+    if os.path.exists(live_path):
+        live = connect(live_path, read_only=True)
+        try:
+            version = read_data_version(live)
+        finally:
+            live.close()
+    if version:
+        async with get_async_engine(shadow_path).begin() as conn:
+            await conn.execute(DataVersion.__table__.insert().values(name="results", version=version))
+
+    print(f"Building shadow results database at {shadow_path}")
+    return shadow_path
+
+def finalize_shadow_db(shadow_path: str):
+    """
+    Prepare a fully written shadow database for serving: build the report summaries and the
+    indexes (faster once the rows are loaded), refresh the planner statistics and fold the
+    WAL back into the file.
+
+    Args:
+        shadow_path (str): Path to the shadow database file
+    """
+    conn = connect(shadow_path)
+    try:
+        with conn:
+            refresh_results_summaries(conn)
+        ensure_results_indexes(conn)
+        optimize_results_db(conn)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+async def swap_results_db(shadow_path: str, live_path: str = RESULTS_DB_PATH):
+    """
+    Make a finalized shadow database the live results database.
+
+    Args:
+        shadow_path (str): Path to the shadow database file
+        live_path (str): Path to the live results database file
+    """
+    start = time.perf_counter()
+    await dispose_engines(shadow_path)
+
+    if is_dedicated_results_db(live_path):
+        finalize_shadow_db(shadow_path)
+        previous = os.path.realpath(live_path) if os.path.islink(live_path) else None
+        link_path = f"{live_path}.swap"
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        os.symlink(os.path.relpath(shadow_path, os.path.dirname(os.path.abspath(live_path))), link_path)
+        os.replace(link_path, live_path)
+        # Readers may still use the previous generation, which the chat app deletes once it
+        # moved on; older ones have been replaced twice and are no longer read
+        for path in generation_paths(live_path):
+            if os.path.realpath(path) in (previous, os.path.realpath(shadow_path)):
+                break
+            remove_db_files(path)
+    else:
+        # Not a file swap: the live table is rewritten in place and keeps its indexes; its
+        # statistics are refreshed after the copy
+        print(f"Results share the chat database; copying the shadow rows into {live_path} in place")
+        _copy_shadow_into_live(shadow_path, live_path)
+        remove_db_files(shadow_path)
+
+    # Connections of this process still point at the old data
+    await dispose_engines(live_path)
+    print(f"Swapped in new results database in {time.perf_counter() - start:.2f}s")
+
+def _copy_shadow_into_live(shadow_path: str, live_path: str):
+    columns = ", ".join(f'"{c}"' for c in RESULTS_COLUMNS)
+    conn = connect(live_path, isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS shadow", (shadow_path,))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM main.results")
+            conn.execute(f"INSERT INTO main.results ({columns}) SELECT {columns} FROM shadow.results")
+            conn.execute(
+                "INSERT OR REPLACE INTO main.data_version (name, version, updated_at) "
+                "SELECT name, version, updated_at FROM shadow.data_version WHERE name = 'results'"
+            )
+            refresh_results_summaries(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("DETACH DATABASE shadow")
+        optimize_results_db(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,159 @@
+import sqlite3
+
+import pandas as pd
+
+from src.db.config import RESULTS_DB_PATH
+from src.db.db_util import read_data_version
+from src.db.engine import connect
+
+# Report summaries are aggregated once per import into results_summary and
+# results_type_summary, so /report reads a few hundred rows instead of grouping the whole
+# results table. They carry the results data version they were built from and are only
+# used while it matches; otherwise the report falls back to aggregating live.
+
+# Maximum length of the resource name list of an issue
+RESOURCE_NAMES_MAX_LENGTH = 200
+
+# Issues grouped across resources, highest risk first. {where} is empty or a type filter.
+SUMMARY_QUERY = """SELECT
+      id,
+      type,
+      description,
+      resolution,
+      severity,
+      risk_score,
+      COUNT(*) AS resource_count,
+      group_concat(resource_name, ', ') AS resource_names
+    FROM
+      results
+    {where}
+    GROUP BY
+      type,
+      avdid,
+      title,
+      description,
+      severity,
+      risk_score
+    ORDER BY
+      risk_score DESC;"""
+
+REFRESH_SUMMARY_QUERY = """SELECT
+      id,
+      type,
+      avdid,
+      description,
+      resolution,
+      severity,
+      risk_score,
+      COUNT(*) AS resource_count,
+      group_concat(resource_name, ', ') AS resource_names
+    FROM
+      results
+    GROUP BY
+      type,
+      avdid,
+      title,
+      description,
+      severity,
+      risk_score
+    ORDER BY
+      risk_score DESC"""
+
+def summary_query(category: str):
+    """Return the summary SQL and its parameters for an upper-case category."""
+    if category == "ALL":
+        return SUMMARY_QUERY.format(where=""), ()
+    return SUMMARY_QUERY.format(where="WHERE\n      type = ?"), (category,)
+
+def limit_string_length(resource_string, max_length=RESOURCE_NAMES_MAX_LENGTH):
+    if len(resource_string) <= max_length:
+        return resource_string
+
+    packages = resource_string.split(", ")
+    result = ""
+    for package in packages:
+        new_part = package + ", "
+        if len(result + new_part) > max_length - 3:  # Reserve space for ellipsis
+            result = result.rstrip(", ")  # Remove trailing comma and space
+            result += "..."
+            break
+        result += new_part
+    return result
+
+def refresh_results_summaries(conn) -> int:
+    """
+    Rebuild the summary tables from the results table and stamp them with the current
+    results data version. The caller owns the transaction.
+
+    Args:
+        conn (sqlite3.Connection): A writable database connection.
+
+    Returns:
+        int: Number of issue groups written.
+    """
+    rows = conn.execute(REFRESH_SUMMARY_QUERY).fetchall()
+    conn.execute("DELETE FROM results_summary")
+    conn.execute("DELETE FROM results_type_summary")
+    conn.executemany(
+        "INSERT INTO results_summary (row_id, id, type, avdid, description, resolution, severity, risk_score, resource_count, resource_names) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(row_id, *row[:-1], limit_string_length(row[-1] or "")) for row_id, row in enumerate(rows, 1)]
+    )
+    conn.execute(
+        "INSERT INTO results_type_summary (type, severity, total_resource_count, issue_count) "
+        "SELECT type, severity, SUM(resource_count), COUNT(*) FROM results_summary GROUP BY type, severity"
+    )
+    conn.execute(
+        "INSERT INTO data_version (name, version, updated_at) VALUES ('results_summary', ?, datetime('now')) "
+        "ON CONFLICT(name) DO UPDATE SET version = excluded.version, updated_at = excluded.updated_at",
+        (read_data_version(conn),)
+    )
+    return len(rows)
+
+def refresh_results_summaries_at(db_path: str = RESULTS_DB_PATH) -> int:
+    """Open a database file and run refresh_results_summaries on it in one transaction."""
+    conn = connect(db_path)
+    try:
+        with conn:
+            return refresh_results_summaries(conn)
+    finally:
+        conn.close()
+
+def read_results_summary(conn, category: str, limit: int = 30):
+    """
+    Read the precomputed report summary of a category.
+
+    Args:
+        conn (sqlite3.Connection): A database connection.
+        category (str): An upper-case category, or "ALL".
+        limit (int): Maximum number of issue rows.
+
+    Returns:
+        tuple: (summary_df, details_df), or None when the summary tables are missing or
+        older than the results.
+    """
+    where, params = ("", ()) if category == "ALL" else ("WHERE type = ?", (category,))
+    # Read the version check and both tables from one snapshot
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        conn.execute("BEGIN")
+    try:
+        results_version = read_data_version(conn, "results")
+        if results_version == 0 or read_data_version(conn, "results_summary") != results_version:
+            return None
+        summary_df = pd.read_sql_query(
+            f"SELECT type, severity, total_resource_count, issue_count FROM results_type_summary {where} ORDER BY type, severity",
+            conn, params=params
+        )
+        details_df = pd.read_sql_query(
+            f"SELECT id, type, description, resolution, severity, risk_score, resource_count, resource_names "
+            f"FROM results_summary {where} ORDER BY row_id LIMIT ?",
+            conn, params=(*params, limit)
+        )
+        return summary_df, details_df
+    except sqlite3.OperationalError:
+        # Databases created before the summary tables existed
+        return None
+    finally:
+        if own_transaction:
+            conn.rollback()
@@ -1,15 +1,18 @@
 import asyncio
 import csv
+import datetime
 import os
-from sqlalchemy import Column, Integer, String, Float, Text, PrimaryKeyConstraint, select
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+from sqlalchemy import Column, Integer, String, Float, Text, PrimaryKeyConstraint, select, text
+from sqlalchemy.orm import declarative_base
 from sqlalchemy.exc import SQLAlchemyError
 import json
 import sqlite3
 
 # Import from config module
-from src.db.config import RESULTS_TABLE_SCHEMA, CHAT_HISTORY_TABLE_SCHEMA, SAMPLE_DATA, DEFAULT_DB_PATH
+from src.db.config import RESULTS_TABLE_SCHEMA, RESULTS_SUMMARY_TABLE_SCHEMA, CVSS_CACHE_TABLE_SCHEMA, QUERY_CACHE_TABLE_SCHEMA, DATA_VERSION_TABLE_SCHEMA, CHAT_HISTORY_TABLE_SCHEMA, SAMPLE_DATA, DEFAULT_DB_PATH, RESULTS_DB_PATH
+from src.db.engine import get_async_engine, get_async_sessionmaker
+from src.db.db_index import ensure_results_indexes_at
 
 # Define the base class for declarative models
 Base = declarative_base()
@@ -40,12 +43,103 @@ class Results(Base):
         attributes = ", ".join(f"{key}={repr(value)}" for key, value in vars(self).items())
         return f"<Results({attributes})>"
 
-# Create an async engine; using the "aiosqlite" dialect for SQLite.
-DATABASE_URL = f"sqlite+aiosqlite:///{DEFAULT_DB_PATH}"
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Define the "results_summary" table: one row per issue group of the summary query
+class ResultsSummary(Base):
+    __tablename__ = "results_summary"
 
-# Create a session maker for async sessions.
-AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    row_id = Column(Integer, primary_key=True)
+    id = Column(String)
+    type = Column(String)
+    avdid = Column(String)
+    description = Column(Text)
+    resolution = Column(Text)
+    severity = Column(String)
+    risk_score = Column(Float)
+    resource_count = Column(Integer)
+    resource_names = Column(Text)
+
+# Define the "results_type_summary" table: issue and resource counts per type and severity
+class ResultsTypeSummary(Base):
+    __tablename__ = "results_type_summary"
+
+    type = Column(String)
+    severity = Column(String)
+    total_resource_count = Column(Integer)
+    issue_count = Column(Integer)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("type", "severity"),
+    )
+
+# Define the "cvss_cache" table holding previously generated CVSS vectors
+class CvssCache(Base):
+    __tablename__ = "cvss_cache"
+
+    cache_key = Column(String, primary_key=True)
+    avdid = Column(String)
+    prompt_version = Column(String)
+    model_name = Column(String)
+    cvss_strings = Column(String)
+    risk_score = Column(Float)
+    created_at = Column(String)
+
+# Define the "query_cache" table holding previously generated SQL
+class QueryCacheEntry(Base):
+    __tablename__ = "query_cache"
+
+    cache_key = Column(String, primary_key=True)
+    question = Column(Text)
+    category = Column(String)
+    sql = Column(Text)
+    schema_version = Column(String)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(Float)
+    last_used_at = Column(Float)
+
+# Define the "data_version" table holding the change counter of each data set
+class DataVersion(Base):
+    __tablename__ = "data_version"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(String)
+
+# Number of rows sent per executemany() call by bulk_upsert_records
+UPSERT_CHUNK_SIZE = int(os.getenv("UPSERT_CHUNK_SIZE", "5000"))
+
+RESULTS_COLUMNS = [column.name for column in Results.__table__.columns]
+RESULTS_PRIMARY_KEY = [column.name for column in Results.__table__.primary_key.columns]
+
+def build_upsert_statement(columns=RESULTS_COLUMNS, conflict_columns=RESULTS_PRIMARY_KEY, table="results"):
+    """
+    Build a parameterized INSERT ... ON CONFLICT DO UPDATE statement.
+
+    Args:
+        columns (list[str]): Columns to insert, bound as named parameters.
+        conflict_columns (list[str]): Columns of the unique key used as the conflict target.
+        table (str): Target table name.
+
+    Returns:
+        str: The SQL statement.
+    """
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    values = ", ".join(f":{c}" for c in columns)
+    conflict = ", ".join(f'"{c}"' for c in conflict_columns)
+    updates = ", ".join(f'"{c}" = excluded."{c}"' for c in columns if c not in conflict_columns)
+    return (
+        f"INSERT INTO {table} ({column_list}) VALUES ({values}) "
+        f"ON CONFLICT({conflict}) DO UPDATE SET {updates}"
+    )
+
+UPSERT_RESULTS_SQL = build_upsert_statement()
+
+CVSS_CACHE_COLUMNS = [column.name for column in CvssCache.__table__.columns]
+UPSERT_CVSS_CACHE_SQL = build_upsert_statement(CVSS_CACHE_COLUMNS, ["cache_key"], table="cvss_cache")
+
+BUMP_DATA_VERSION_SQL = (
+    "INSERT INTO data_version (name, version, updated_at) VALUES (:name, 1, :updated_at) "
+    "ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at"
+)
 
 def ensure_directory_exists(db_path):
     """
@@ -102,23 +196,27 @@ async def init_db(db_path=DEFAULT_DB_PATH):
     
     # First create the database using SQLAlchemy
     try:
-        # Update the engine to use the provided path
-        global engine, AsyncSessionLocal, DATABASE_URL
-        engine = create_async_engine(DATABASE_URL, echo=True)
-        AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-        
         # Create tables using SQLAlchemy metadata
-        async with engine.begin() as conn:
+        async with get_async_engine(db_path).begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
             print("Tables created successfully using SQLAlchemy")
-        return True
     except Exception as e:
         print(f"Error creating tables with SQLAlchemy: {e}")
         
         # Fallback to raw SQL as a backup method
-        return await init_db_with_raw_sql(db_path, RESULTS_TABLE_SCHEMA)
+        if not await init_db_with_raw_sql(db_path, RESULTS_TABLE_SCHEMA + RESULTS_SUMMARY_TABLE_SCHEMA + CVSS_CACHE_TABLE_SCHEMA + QUERY_CACHE_TABLE_SCHEMA + DATA_VERSION_TABLE_SCHEMA):
+            return False
 
-async def init_sample(db_path=DEFAULT_DB_PATH):
+    try:
+        created = await asyncio.to_thread(ensure_results_indexes_at, db_path)
+        if created:
+            print(f"Updated results indexes: {', '.join(created)}")
+        return True
+    except sqlite3.Error as e:
+        print(f"Error creating results indexes: {e}")
+        return False
+
+async def init_sample(db_path=RESULTS_DB_PATH):
     """
     Initialize the database with sample data (async version).
     
@@ -135,25 +233,26 @@ async def init_sample(db_path=DEFAULT_DB_PATH):
     
     # Then add sample data using batch_upsert_records
     try:
-        await batch_upsert_records(SAMPLE_DATA)
+        await batch_upsert_records(SAMPLE_DATA, db_path)
         print(f"Sample data added successfully to {db_path}")
         return True
     except Exception as e:
         print(f"Error adding sample data: {e}")
         return False
 
-async def upsert_record(record_data: dict) -> Results:
+async def upsert_record(record_data: dict, db_path: str = RESULTS_DB_PATH) -> Results:
     """
     Upsert (insert or update) a record into the results table.
 
     Args:
         record_data (dict): A dictionary of column values for the record.
+        db_path (str): Path to the results database file
 
     Returns:
         Results: The upserted record.
     """
     try:
-        async with AsyncSessionLocal() as session:
+        async with get_async_sessionmaker(db_path)() as session:
             async with session.begin():
                 # Use merge to perform an upsert.
                 merged_record = await session.merge(Results(**record_data))
@@ -163,19 +262,20 @@ async def upsert_record(record_data: dict) -> Results:
         print(f"Error upserting record: {e}")
         raise
 
-async def batch_upsert_records(records_data: list[dict]) -> list[Results]:
+async def batch_upsert_records(records_data: list[dict], db_path: str = RESULTS_DB_PATH) -> list[Results]:
     """
     Upsert (insert or update) multiple records into the results table in a single transaction.
 
     Args:
         records_data (list[dict]): A list of dictionaries, each containing column values for a record.
+        db_path (str): Path to the results database file
 
     Returns:
         list[Results]: A list of upserted records.
     """
     upserted_records = []
     try:
-        async with AsyncSessionLocal() as session:
+        async with get_async_sessionmaker(db_path)() as session:
             async with session.begin():
                 for record_data in records_data:
                     # Use merge to perform an upsert.
@@ -187,6 +287,218 @@ async def batch_upsert_records(records_data: list[dict]) -> list[Results]:
         print(f"Error batch upserting records: {e}")
         raise
 
+async def bulk_upsert_records(records_data: list[dict], chunk_size: int = UPSERT_CHUNK_SIZE, db_path: str = RESULTS_DB_PATH) -> int:
+    """
+    Upsert multiple records into the results table without building ORM objects.
+
+    Rows are sent in chunks of ``chunk_size`` as executemany() batches of a single
+    INSERT ... ON CONFLICT(type, id, resource_name) DO UPDATE statement, all within
+    one transaction.
+
+    Args:
+        records_data (list[dict]): A list of dictionaries, each containing column values for a record.
+        chunk_size (int): Number of rows per executemany() call.
+        db_path (str): Path to the results database file
+
+    Returns:
+        int: The number of rows written.
+    """
+    if not records_data:
+        return 0
+
+    start = time.perf_counter()
+    statement = text(UPSERT_RESULTS_SQL)
+    try:
+        async with get_async_engine(db_path).begin() as conn:
+            for offset in range(0, len(records_data), chunk_size):
+                chunk = [
+                    {column: record.get(column) for column in RESULTS_COLUMNS}
+                    for record in records_data[offset:offset + chunk_size]
+                ]
+                await conn.execute(statement, chunk)
+    except SQLAlchemyError as e:
+        print(f"Error bulk upserting records: {e}")
+        raise
+
+    elapsed = time.perf_counter() - start
+    rate = len(records_data) / elapsed if elapsed > 0 else float("inf")
+    print(f"Upserted {len(records_data)} rows in {elapsed:.2f}s ({rate:.0f} rows/s)")
+    return len(records_data)
+
+class UpsertWriter:
+    """
+    Serialize results upserts from concurrent producers through a single writer task,
+    so SQLite never sees competing writers.
+
+    Usage:
+        async with UpsertWriter() as writer:
+            await writer.submit(rows)
+    """
+
+    def __init__(self, max_pending: int = 4, db_path: str = RESULTS_DB_PATH):
+        self.db_path = db_path
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.task = None
+        self.error = None
+        self.rows_written = 0
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if await self._put(None):
+            await self.task
+        if self.error and exc_type is None:
+            raise self.error
+
+    async def submit(self, records_data: list[dict]) -> None:
+        """
+        Queue records for upsert, waiting while the writer is ``max_pending`` batches behind.
+
+        Raises:
+            Exception: The error of a previous batch, or RuntimeError if the writer task stopped.
+        """
+        if self.error:
+            raise self.error
+        if not await self._put(records_data):
+            raise self.error or RuntimeError("Upsert writer stopped")
+
+    async def _put(self, item) -> bool:
+        """Queue an item unless the writer task has ended; never waits on a queue nobody drains."""
+        if self.task.done():
+            return False
+        put = asyncio.ensure_future(self.queue.put(item))
+        await asyncio.wait({put, self.task}, return_when=asyncio.FIRST_COMPLETED)
+        if put.done():
+            return True
+        put.cancel()
+        return False
+
+    async def _run(self):
+        while True:
+            records_data = await self.queue.get()
+            if records_data is None:
+                return
+            # Keep draining after a failure so producers never block on a full queue
+            if self.error:
+                continue
+            try:
+                self.rows_written += await bulk_upsert_records(records_data, db_path=self.db_path)
+            except Exception as e:
+                # Bad row data as well as database errors; submit() and __aexit__ re-raise it
+                self.error = e
+
+async def get_cached_cvss(cache_keys: list[str]) -> dict:
+    """
+    Look up previously generated CVSS vectors.
+
+    Args:
+        cache_keys (list[str]): Cache keys to look up.
+
+    Returns:
+        dict: Mapping of cache key to a (cvss_strings, risk_score) tuple for every hit.
+    """
+    if not cache_keys:
+        return {}
+    try:
+        async with get_async_sessionmaker()() as session:
+            result = await session.execute(
+                select(CvssCache.cache_key, CvssCache.cvss_strings, CvssCache.risk_score)
+                .where(CvssCache.cache_key.in_(cache_keys))
+            )
+            return {key: (cvss_strings, risk_score) for key, cvss_strings, risk_score in result.all()}
+    except SQLAlchemyError as e:
+        # A missing or unreadable cache only means the vectors are generated again
+        print(f"Error reading CVSS cache: {e}")
+        return {}
+
+async def put_cached_cvss(records_data: list[dict]) -> None:
+    """
+    Store generated CVSS vectors in the cache.
+
+    Args:
+        records_data (list[dict]): Rows with the cache_key, avdid, prompt_version, model_name,
+            cvss_strings and risk_score columns.
+    """
+    if not records_data:
+        return
+    created_at = datetime.datetime.now().isoformat()
+    rows = [
+        {**{column: record.get(column) for column in CVSS_CACHE_COLUMNS}, "created_at": created_at}
+        for record in records_data
+    ]
+    try:
+        async with get_async_engine().begin() as conn:
+            await conn.execute(text(UPSERT_CVSS_CACHE_SQL), rows)
+    except SQLAlchemyError as e:
+        print(f"Error writing CVSS cache: {e}")
+
+async def invalidate_cvss_cache(prompt_version: str = None, current_version: str = None) -> int:
+    """
+    Delete cached CVSS vectors.
+
+    Args:
+        prompt_version (str, optional): Delete the entries of this prompt version, or every
+            entry when "all". When omitted, entries of any version other than
+            ``current_version`` are deleted.
+        current_version (str, optional): The prompt version in use.
+
+    Returns:
+        int: Number of deleted entries.
+    """
+    if prompt_version == "all":
+        stmt = CvssCache.__table__.delete()
+    elif prompt_version:
+        stmt = CvssCache.__table__.delete().where(CvssCache.prompt_version == prompt_version)
+    else:
+        stmt = CvssCache.__table__.delete().where(CvssCache.prompt_version != current_version)
+    try:
+        async with get_async_engine().begin() as conn:
+            result = await conn.execute(stmt)
+            return result.rowcount
+    except SQLAlchemyError as e:
+        print(f"Error invalidating CVSS cache: {e}")
+        raise
+
+async def bump_data_version(name: str = "results", db_path: str = RESULTS_DB_PATH) -> int:
+    """
+    Increment the version counter of a data set, signalling readers that it changed.
+
+    Args:
+        name (str): The data set name.
+        db_path (str): Path to the database file
+
+    Returns:
+        int: The new version.
+    """
+    try:
+        async with get_async_engine(db_path).begin() as conn:
+            await conn.execute(text(BUMP_DATA_VERSION_SQL), {"name": name, "updated_at": datetime.datetime.now().isoformat()})
+            result = await conn.execute(select(DataVersion.version).where(DataVersion.name == name))
+            return result.scalar_one()
+    except SQLAlchemyError as e:
+        print(f"Error bumping {name} data version: {e}")
+        raise
+
+def read_data_version(conn: sqlite3.Connection, name: str = "results") -> int:
+    """
+    Read the version counter of a data set.
+
+    Args:
+        conn (sqlite3.Connection): An open database connection.
+        name (str): The data set name.
+
+    Returns:
+        int: The current version, 0 if the data set was never written.
+    """
+    try:
+        row = conn.execute("SELECT version FROM data_version WHERE name = ?", (name,)).fetchone()
+    except sqlite3.OperationalError:
+        # Databases created before the data_version table existed
+        return 0
+    return row[0] if row else 0
+
 async def query_records(record_type: str):
     """
     Query records from the results table filtered by the type column.
@@ -198,7 +510,7 @@ async def query_records(record_type: str):
         List[Results]: A list of matching Results records.
     """
     try:
-        async with AsyncSessionLocal() as session:
+        async with get_async_sessionmaker(RESULTS_DB_PATH)() as session:
             result = await session.execute(
                 select(Results).where(Results.type == record_type)
             )
@@ -216,7 +528,7 @@ async def query_all_records():
         List[Results]: A list of all Records.
     """
     try:
-        async with AsyncSessionLocal() as session:
+        async with get_async_sessionmaker(RESULTS_DB_PATH)() as session:
             result = await session.execute(select(Results))
             records = result.scalars().all()
             return records
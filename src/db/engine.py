@@ -0,0 +1,233 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from src.db.config import DEFAULT_DB_PATH
+
+# Shared engine and session factory registry. Every module talking to a SQLite file
+# gets its engines from here, so one file has one async pool and one sync pool per
+# process, and connection settings live in a single place.
+
+# Log every SQL statement (SQLAlchemy echo)
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() in ("1", "true", "yes")
+# Log statements slower than this many milliseconds; 0 disables the slow-query log
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "0"))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+# Journal mode set by every writable connection. WAL lets readers run while a writer commits.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+
+# PRAGMAs applied to every new connection
+SQLITE_PRAGMAS = {
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000")),
+    # NORMAL is durable across application crashes in WAL mode and skips most fsyncs
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # Negative values are in KiB
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+# Number of idle read-only connections kept per database file
+READ_POOL_SIZE = int(os.getenv("READ_POOL_SIZE", "4"))
+
+logger = logging.getLogger("db")
+
+_async_engines = {}
+_async_sessionmakers = {}
+_sync_engines = {}
+_read_pools = {}
+
+def apply_pragmas(dbapi_connection, pragmas: dict = SQLITE_PRAGMAS):
+    """Apply PRAGMA settings to a DB-API connection (sqlite3 or aiosqlite adapter)."""
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+def _on_connect(dbapi_connection, connection_record):
+    apply_pragmas(dbapi_connection, {"journal_mode": SQLITE_JOURNAL_MODE, **SQLITE_PRAGMAS})
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+    if elapsed_ms >= SQL_SLOW_QUERY_MS:
+        logger.warning(f"Slow query ({elapsed_ms:.1f} ms): {statement}")
+
+def _instrument(sync_engine):
+    event.listen(sync_engine, "connect", _on_connect)
+    if SQL_SLOW_QUERY_MS > 0:
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+def get_async_engine(db_path: str = DEFAULT_DB_PATH):
+    """
+    Return the shared async (aiosqlite) engine of a database file, creating it on first use.
+
+    Args:
+        db_path (str): Path to the database file
+    """
+    engine = _async_engines.get(db_path)
+    if engine is None:
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{db_path}",
+            echo=SQL_ECHO,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+        _instrument(engine.sync_engine)
+        _async_engines[db_path] = engine
+    return engine
+
+def get_async_sessionmaker(db_path: str = DEFAULT_DB_PATH):
+    """
+    Return the shared async session factory of a database file.
+
+    Args:
+        db_path (str): Path to the database file
+    """
+    factory = _async_sessionmakers.get(db_path)
+    if factory is None:
+        factory = sessionmaker(get_async_engine(db_path), expire_on_commit=False, class_=AsyncSession)
+        _async_sessionmakers[db_path] = factory
+    return factory
+
+def get_sync_engine(db_path: str = DEFAULT_DB_PATH):
+    """
+    Return the shared synchronous engine of a database file, creating it on first use.
+
+    Args:
+        db_path (str): Path to the database file
+    """
+    engine = _sync_engines.get(db_path)
+    if engine is None:
+        engine = create_engine(
+            f"sqlite:///{db_path}",
+            echo=SQL_ECHO,
+            poolclass=QueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+        _instrument(engine)
+        _sync_engines[db_path] = engine
+    return engine
+
+def connect(db_path: str = DEFAULT_DB_PATH, read_only: bool = False, **kwargs) -> sqlite3.Connection:
+    """
+    Open a raw sqlite3 connection with the registry PRAGMAs applied.
+
+    Args:
+        db_path (str): Path to the database file
+        read_only (bool): Open the file with mode=ro; writes then fail with sqlite3.OperationalError.
+        **kwargs: Additional arguments for sqlite3.connect.
+    """
+    if read_only:
+        conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True, **kwargs)
+        apply_pragmas(conn)
+    else:
+        conn = sqlite3.connect(db_path, **kwargs)
+        apply_pragmas(conn, {"journal_mode": SQLITE_JOURNAL_MODE, **SQLITE_PRAGMAS})
+    return conn
+
+class ReadConnectionPool:
+    """
+    Hand out read-only sqlite3 connections, one per request, and keep up to ``size`` idle
+    ones for reuse. Connections are not bound to the creating thread, so a request may run
+    its query in a worker thread.
+
+    Usage:
+        with pool.acquire() as conn:
+            conn.execute(query)
+    """
+
+    def __init__(self, db_path: str, size: int = READ_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = []
+        self._generation = 0
+        self._in_use = Counter()  # generation -> connections handed out
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            generation = self._generation
+            self._in_use[generation] += 1
+        try:
+            if conn is None:
+                conn = connect(self.db_path, read_only=True, check_same_thread=False)
+            yield conn
+        finally:
+            # Never leave a transaction open on a pooled connection
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                self._in_use[generation] -= 1
+                if not self._in_use[generation]:
+                    del self._in_use[generation]
+                keep = conn is not None and generation == self._generation and len(self._idle) < self.size
+                if keep:
+                    self._idle.append(conn)
+            if not keep and conn is not None:
+                conn.close()
+
+    def reset(self):
+        """Close the idle connections; connections in use are closed when released."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._generation += 1
+        for conn in idle:
+            conn.close()
+
+    def draining(self) -> bool:
+        """Whether connections opened before the last reset are still in use."""
+        with self._lock:
+            return any(generation < self._generation for generation in self._in_use)
+
+def get_read_pool(db_path: str = DEFAULT_DB_PATH) -> ReadConnectionPool:
+    """
+    Return the shared read-only connection pool of a database file.
+
+    Args:
+        db_path (str): Path to the database file
+    """
+    pool = _read_pools.get(db_path)
+    if pool is None:
+        pool = _read_pools.setdefault(db_path, ReadConnectionPool(db_path))
+    return pool
+
+async def dispose_engines(db_path: str = None):
+    """
+    Close the pooled connections of one database file, or of every registered file.
+
+    Args:
+        db_path (str, optional): Path to the database file; all files when omitted.
+    """
+    paths = [db_path] if db_path else list(set(_async_engines) | set(_sync_engines) | set(_read_pools))
+    for path in paths:
+        pool = _read_pools.pop(path, None)
+        if pool is not None:
+            pool.reset()
+        _async_sessionmakers.pop(path, None)
+        engine = _async_engines.pop(path, None)
+        if engine is not None:
+            await engine.dispose()
+        engine = _sync_engines.pop(path, None)
+        if engine is not None:
+            engine.dispose()
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from src.db.config import DEFAULT_DB_PATH, QUERY_CACHE_TABLE_SCHEMA
+from src.db.engine import connect
+
+# Entries unused for longer than this are expired
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Least recently used entries beyond this count are evicted
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1000"))
+
+# Words that do not change which SQL answers a question
+_FILLER_WORDS = {
+    "a", "an", "the", "please", "show", "me", "list", "give", "tell", "what", "which",
+    "are", "is", "my", "our", "all", "of", "in", "for", "can", "you", "i", "want", "to", "see",
+}
+
+def normalize_question(question: str) -> str:
+    """
+    Reduce a question to the words that select its SQL: lower case, punctuation and
+    filler words removed. Identifiers such as CVE-2023-1234 or AVD-KSV-0001 are kept whole.
+    """
+    words = re.findall(r"[a-z0-9][a-z0-9_.:/-]*[a-z0-9]|[a-z0-9]", question.lower())
+    return " ".join(word for word in words if word not in _FILLER_WORDS)
+
+def results_schema_version(conn) -> str:
+    """Hash of the results table definition; changes whenever its columns change."""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'results'").fetchone()
+    return hashlib.sha256((row[0] if row else "").encode("utf-8")).hexdigest()[:16]
+
+class QueryCache:
+    """
+    Persistent cache of validated LLM generated SQL, keyed by normalized question and
+    category. Entries expire after ``ttl`` seconds without use, the least recently used
+    ones are evicted beyond ``max_entries``, and entries written against another results
+    schema version are re-validated before being served.
+
+    Lookups only read the database; hits are counted in memory and written together with
+    the next put(). Both do blocking I/O and are meant to run in a worker thread.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_entries: int = QUERY_CACHE_MAX_ENTRIES, ttl: float = QUERY_CACHE_TTL_SECONDS):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # cache_key -> [hits, last_used_at, schema_version] not yet written to the database
+        self._pending = {}
+        self._lock = threading.Lock()
+        try:
+            conn = connect(self.db_path)
+            try:
+                conn.executescript(QUERY_CACHE_TABLE_SCHEMA)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error initializing query cache: {e}")
+
+    @staticmethod
+    def cache_key(question: str, category: str) -> str:
+        return hashlib.sha256(f"{category.upper()}\x00{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+    def get(self, question: str, category: str, schema_version: str, revalidate=None):
+        """
+        Look up the SQL of a question.
+
+        Args:
+            question (str): The user question.
+            category (str): The question category.
+            schema_version (str): Current results schema version.
+            revalidate (callable, optional): Called with the SQL of an entry written against
+                another schema version; the entry is not served unless it returns True.
+
+        Returns:
+            str: The cached SQL, or None on a miss.
+        """
+        key = self.cache_key(question, category)
+        now = time.time()
+        try:
+            conn = connect(self.db_path, read_only=True)
+            try:
+                row = conn.execute(
+                    "SELECT sql, schema_version, last_used_at FROM query_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # A missing or unreadable cache only means the SQL is generated again
+            print(f"Error reading query cache: {e}")
+            self.misses += 1
+            return None
+
+        with self._lock:
+            pending = self._pending.get(key)
+        if row is None:
+            self.misses += 1
+            return None
+        sql, entry_schema_version, last_used_at = row
+        if pending:
+            last_used_at = max(last_used_at, pending[1])
+            entry_schema_version = pending[2]
+        # Expired or invalid entries are replaced by the next put() of the question
+        if now - last_used_at > self.ttl or (
+            entry_schema_version != schema_version and not (revalidate and revalidate(sql))
+        ):
+            self.misses += 1
+            return None
+        with self._lock:
+            pending = self._pending.setdefault(key, [0, now, schema_version])
+            pending[0] += 1
+            pending[1] = now
+            pending[2] = schema_version
+        self.hits += 1
+        return sql
+
+    def _flush_pending(self, conn):
+        """Write the hits counted since the last put()."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        conn.executemany(
+            "UPDATE query_cache SET hits = hits + ?, last_used_at = MAX(last_used_at, ?), schema_version = ? WHERE cache_key = ?",
+            [(hits, last_used_at, schema_version, key) for key, (hits, last_used_at, schema_version) in pending.items()]
+        )
+
+    def put(self, question: str, category: str, sql: str, schema_version: str):
+        """Store the validated SQL of a question, write the pending hits and evict entries beyond the limits."""
+        now = time.time()
+        try:
+            conn = connect(self.db_path)
+            try:
+                with conn:
+                    self._flush_pending(conn)
+                    conn.execute(
+                        "INSERT INTO query_cache (cache_key, question, category, sql, schema_version, hits, created_at, last_used_at) "
+                        "VALUES (?, ?, ?, ?, ?, 0, ?, ?) "
+                        "ON CONFLICT(cache_key) DO UPDATE SET sql = excluded.sql, schema_version = excluded.schema_version, "
+                        "last_used_at = excluded.last_used_at",
+                        (self.cache_key(question, category), normalize_question(question), category.upper(), sql, schema_version, now, now)
+                    )
+                    conn.execute("DELETE FROM query_cache WHERE last_used_at < ?", (now - self.ttl,))
+                    conn.execute(
+                        "DELETE FROM query_cache WHERE cache_key NOT IN "
+                        "(SELECT cache_key FROM query_cache ORDER BY last_used_at DESC LIMIT ?)",
+                        (self.max_entries,)
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error writing query cache: {e}")
+
+    def stats(self) -> dict:
+        """Counters for logging and metrics."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
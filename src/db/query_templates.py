@@ -0,0 +1,217 @@
+import re
+from collections import namedtuple
+from typing import Optional
+
+# Prebuilt parameterized queries for the question classes asked most often. A question is
+# matched locally with regular expressions and keywords, so these skip the LLM round-trip
+# of generate_query entirely.
+
+TemplateMatch = namedtuple("TemplateMatch", ["name", "sql", "params"])
+
+# Default and maximum N of "top N" questions
+TOP_N_DEFAULT = 10
+TOP_N_MAX = 100
+# Row limit of per-resource listings
+RESOURCE_ISSUES_LIMIT = 50
+
+_TYPE_KEYWORDS = [
+    ("KUBERNETES", r"\b(kubernetes|k8s|cluster|pods?|deployments?)\b"),
+    ("AWS", r"\b(aws|amazon|cloud ?account)\b"),
+    ("CONTAINER", r"\b(containers?|images?|docker)\b"),
+    ("CODE", r"\b(code|source|repo|repository|filesystem|dependencies)\b"),
+]
+_SEVERITIES = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+_ISSUE_WORDS = r"(issues?|risks?|risky|findings?|vulnerabilit(y|ies)|misconfig\w*|problems?|threats?|cves?)"
+_FINDING_ID = r"\b(CVE-\d{4}-\d{4,}|GHSA(?:-[0-9a-z]{4}){3}|AVD-[A-Z]+-\d{4}|KSV\d{3,}|DS\d{3,})\b"
+# Questions asking for an explanation rather than for data
+_EXPLANATORY = r"\b(why|how come|explain|define|definition|meaning|mean|difference)\b"
+# Resource names are only recognized when quoted, or shaped like an identifier
+# (e.g. deployment/nginx, eks:cloudwatch-agent-role, nginx:1.25, arn:aws:...)
+_RESOURCE_QUOTED = r"[\"'`]([^\"'`]+)[\"'`]"
+_RESOURCE_IDENTIFIER = r"([\w@]*[/:.-][\w./:@-]*[\w/@-])"
+
+_GROUPED_ISSUE_COLUMNS = """type,
+      id,
+      title,
+      severity,
+      risk_score,
+      COUNT(*) AS resource_count,
+      group_concat(resource_name, ', ') AS resource_names"""
+
+def _question_type(question: str, category: str) -> Optional[str]:
+    if category and category.upper() != "ALL":
+        return category.upper()
+    for type_name, pattern in _TYPE_KEYWORDS:
+        if re.search(pattern, question, re.IGNORECASE):
+            return type_name
+    return None
+
+def _question_severity(question: str) -> Optional[str]:
+    for severity in _SEVERITIES:
+        if re.search(rf"\b{severity}\b", question, re.IGNORECASE):
+            return severity
+    return None
+
+def _filters(type_name, severity):
+    conditions, params = [], []
+    if type_name:
+        conditions.append("type = ?")
+        params.append(type_name)
+    if severity:
+        conditions.append("severity = ?")
+        params.append(severity)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def match_finding_id(question: str, category: str) -> Optional[TemplateMatch]:
+    """Which packages or resources have CVE Z / are affected by check Z."""
+    found = re.search(_FINDING_ID, question, re.IGNORECASE)
+    if not found:
+        return None
+    finding_id = found.group(1).upper()
+    sql = """SELECT
+      type,
+      id,
+      avdid,
+      title,
+      severity,
+      risk_score,
+      resource_name,
+      cause_metadata AS target,
+      resolution
+    FROM
+      results
+    WHERE
+      id = ? OR avdid = ?
+    ORDER BY
+      risk_score DESC
+    LIMIT ?"""
+    return TemplateMatch("finding_id", sql, (finding_id, finding_id, RESOURCE_ISSUES_LIMIT))
+
+def match_severity_count(question: str, category: str) -> Optional[TemplateMatch]:
+    """Count of issues by severity, optionally for one type."""
+    if re.search(_EXPLANATORY, question, re.IGNORECASE):
+        return None
+    if not re.search(r"\b(how many|count|number of|breakdown|distribution|split)\b", question, re.IGNORECASE):
+        return None
+    if not re.search(r"\bseverit(y|ies)\b", question, re.IGNORECASE):
+        return None
+    where, params = _filters(_question_type(question, category), None)
+    sql = f"""SELECT
+      type,
+      severity,
+      COUNT(*) AS issue_count,
+      COUNT(DISTINCT resource_name) AS resource_count
+    FROM
+      results
+    {where}
+    GROUP BY
+      type,
+      severity
+    ORDER BY
+      type,
+      CASE severity WHEN 'CRITICAL' THEN 0 WHEN 'HIGH' THEN 1 WHEN 'MEDIUM' THEN 2 WHEN 'LOW' THEN 3 ELSE 4 END"""
+    return TemplateMatch("severity_count", sql, tuple(params))
+
+def match_top_n(question: str, category: str) -> Optional[TemplateMatch]:
+    """Top N issues by risk score, optionally for one type and severity."""
+    if re.search(_EXPLANATORY, question, re.IGNORECASE):
+        return None
+    top = re.search(r"\btop\s+(\d+)\b", question, re.IGNORECASE)
+    if not top and not re.search(r"\b(top|highest|riskiest|most (critical|severe|risky|important|dangerous))\b", question, re.IGNORECASE):
+        return None
+    if not re.search(rf"\b{_ISSUE_WORDS}\b", question, re.IGNORECASE):
+        return None
+    limit = min(int(top.group(1)), TOP_N_MAX) if top else TOP_N_DEFAULT
+    where, params = _filters(_question_type(question, category), _question_severity(question))
+    sql = f"""SELECT
+      {_GROUPED_ISSUE_COLUMNS}
+    FROM
+      results
+    {where}
+    GROUP BY
+      type,
+      avdid,
+      title,
+      severity,
+      risk_score
+    ORDER BY
+      risk_score DESC
+    LIMIT ?"""
+    return TemplateMatch("top_n", sql, (*params, limit))
+
+def match_resource_issues(question: str, category: str) -> Optional[TemplateMatch]:
+    """Issues of one named resource."""
+    if re.search(_EXPLANATORY, question, re.IGNORECASE):
+        return None
+    found = re.search(
+        rf"\b{_ISSUE_WORDS}\s+(?:for|on|of|in|affecting|with)\s+(?:the\s+)?"
+        rf"(?:(?:resource|package|image|pod|deployment|bucket|role)\s+)?(?:{_RESOURCE_QUOTED}|{_RESOURCE_IDENTIFIER}(?![\w/@-]|[.:][\w/@-]))",
+        question, re.IGNORECASE
+    )
+    if not found:
+        return None
+    # Plain words ("issues in production", "risks of running ...") are topics, not names
+    resource = (found.group(found.lastindex) or "").strip()
+    if not resource:
+        return None
+    sql = """SELECT
+      type,
+      id,
+      title,
+      severity,
+      risk_score,
+      resource_name,
+      message
+    FROM
+      results
+    WHERE
+      resource_name = ? OR resource_name LIKE ?
+    ORDER BY
+      risk_score DESC
+    LIMIT ?"""
+    return TemplateMatch("resource_issues", sql, (resource, f"%{resource}%", RESOURCE_ISSUES_LIMIT))
+
+# Tried in order; the most specific classes come first
+QUERY_TEMPLATES = [
+    match_finding_id,
+    match_severity_count,
+    match_top_n,
+    match_resource_issues,
+]
+
+def match_query_template(question: str, category: str = "ALL") -> Optional[TemplateMatch]:
+    """
+    Match a question against the prebuilt query templates.
+
+    Args:
+        question (str): The user question.
+        category (str): The question category, or "ALL".
+
+    Returns:
+        TemplateMatch: The first match, or None when the question needs generate_query.
+    """
+    for matcher in QUERY_TEMPLATES:
+        match = matcher(question or "", category)
+        if match:
+            return match
+    return None
+
+_MISSING = object()
+
+def render_query(sql: str, params=()) -> str:
+    """
+    Inline the parameters of a template query, for display to the model and in logs.
+    Placeholders left once the parameters run out (e.g. a literal '?') are kept as they are.
+    """
+    values = iter(params)
+
+    def literal(match):
+        value = next(values, _MISSING)
+        if value is _MISSING:
+            return match.group(0)
+        if isinstance(value, (int, float)):
+            return str(value)
+        return "'" + str(value).replace("'", "''") + "'"
+
+    return re.sub(r"\?", literal, sql)
@@ -0,0 +1,72 @@
+import os
+
+from src.utils.utils import get_encoding
+
+# Token budget of the query results placed in the reason prompt
+RESULTS_MAX_TOKENS = int(os.getenv("RESULTS_MAX_TOKENS", "16000"))
+# Tokens kept free for the footer line
+FOOTER_TOKENS = 32
+
+class TSVResultSerializer:
+    """
+    Serialize query results for a prompt as tab separated values: the column names once,
+    then one line per row, until the token budget is spent. finish() appends a footer
+    with the number of rows shown, so the model knows whether it saw everything.
+
+    Rows are added one at a time as they are fetched (see QuerySandbox.execute), so results
+    beyond the budget are never materialized.
+    """
+
+    def __init__(self, max_tokens: int = RESULTS_MAX_TOKENS, model_name: str = "gpt-4o"):
+        self.max_tokens = max_tokens
+        self.encoding = get_encoding(model_name)
+        self.lines = []
+        self.tokens = 0
+        self.row_count = 0
+        self.over_budget = False
+
+    @staticmethod
+    def format_value(value) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, float):
+            return f"{value:g}"
+        # Keep one row per line and the columns aligned
+        return str(value).replace("\t", " ").replace("\r", " ").replace("\n", " ")
+
+    def _append(self, line: str) -> bool:
+        tokens = len(self.encoding.encode(line)) + 1  # and the newline
+        if self.tokens + tokens > self.max_tokens - FOOTER_TOKENS:
+            self.over_budget = True
+            return False
+        self.lines.append(line)
+        self.tokens += tokens
+        return True
+
+    def start(self, columns):
+        """Write the header line."""
+        self._append("\t".join(columns))
+
+    def add(self, row) -> bool:
+        """Write one row; returns False, without writing it, once the budget is spent."""
+        if self.over_budget or not self._append("\t".join(self.format_value(value) for value in row)):
+            return False
+        self.row_count += 1
+        return True
+
+    def finish(self, truncated: bool = False) -> str:
+        """
+        Return the serialized results with their footer.
+
+        Args:
+            truncated (bool): Whether the query returned rows that were not added.
+        """
+        rows = f"{self.row_count} row{'' if self.row_count == 1 else 's'}"
+        if truncated and not self.row_count and self.over_budget:
+            footer = "(0 rows shown; the query returned rows, but the first one alone exceeded the token budget.)"
+        elif truncated:
+            reason = "token budget" if self.over_budget else "row limit"
+            footer = f"({rows} shown; the query returned more rows, left out by the {reason}.)"
+        else:
+            footer = f"({rows})"
+        return "\n".join(self.lines + [footer])
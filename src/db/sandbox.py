@@ -0,0 +1,180 @@
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# Execution sandbox of LLM generated SQL. Queries run on the read-only pool connections
+# (mode=ro) under an authorizer that only admits reads of the scan result tables, with a
+# progress handler enforcing a wall-clock and VM instruction budget, and a cap on the
+# number of rows fetched.
+
+# Wall-clock budget of one query, in seconds
+SANDBOX_TIMEOUT_SECONDS = float(os.getenv("SANDBOX_TIMEOUT_SECONDS", "5"))
+# Budget of SQLite virtual machine instructions of one query
+SANDBOX_MAX_VM_STEPS = int(os.getenv("SANDBOX_MAX_VM_STEPS", "50000000"))
+# Rows returned to the graph; further rows are not fetched
+SANDBOX_MAX_ROWS = int(os.getenv("SANDBOX_MAX_ROWS", "500"))
+# Largest string or blob a query may build (e.g. with group_concat), in bytes
+SANDBOX_MAX_VALUE_BYTES = int(os.getenv("SANDBOX_MAX_VALUE_BYTES", str(1024 * 1024)))
+# VM instructions between two progress handler calls
+SANDBOX_PROGRESS_INTERVAL = 10000
+# Rows fetched from the cursor at a time
+SANDBOX_FETCH_BATCH = 100
+
+# Tables generated queries may read
+SANDBOX_READABLE_TABLES = {"results", "results_summary", "results_type_summary"}
+
+# Built-in SQL functions generated queries may call; anything else, in particular
+# load_extension and the functions an application registered, is denied
+SANDBOX_ALLOWED_FUNCTIONS = {
+    # Core scalar functions
+    "abs", "char", "coalesce", "concat", "concat_ws", "format", "glob", "hex", "ifnull", "iif",
+    "instr", "length", "like", "likelihood", "likely", "lower", "ltrim", "max", "min", "nullif",
+    "octet_length", "printf", "quote", "random", "replace", "round", "rtrim", "sign", "soundex",
+    "substr", "substring", "trim", "typeof", "unhex", "unicode", "unlikely", "upper", "zeroblob",
+    # Aggregates
+    "avg", "count", "group_concat", "string_agg", "sum", "total",
+    # Window functions
+    "row_number", "rank", "dense_rank", "percent_rank", "cume_dist", "ntile", "lag", "lead",
+    "first_value", "last_value", "nth_value",
+    # Date and time
+    "date", "time", "datetime", "julianday", "unixepoch", "strftime", "timediff",
+    # Math
+    "acos", "acosh", "asin", "asinh", "atan", "atan2", "atanh", "ceil", "ceiling", "cos", "cosh",
+    "degrees", "exp", "floor", "ln", "log", "log10", "log2", "mod", "pi", "pow", "power",
+    "radians", "sin", "sinh", "sqrt", "tan", "tanh", "trunc",
+    # JSON (cause_metadata and cvss_strings hold JSON)
+    "json", "json_array", "json_array_length", "json_extract", "json_group_array",
+    "json_group_object", "json_object", "json_quote", "json_type", "json_valid",
+}
+
+_ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),
+}
+
+SandboxResult = namedtuple("SandboxResult", ["columns", "rows", "row_count", "truncated"])
+
+class QueryRejected(Exception):
+    """A query was denied by the sandbox authorizer or stopped by its budget."""
+
+class QuerySandbox:
+    """
+    Run untrusted SELECT statements with bounded cost and read-only access.
+
+    Usage:
+        with app_context.read_connection() as conn:
+            result = sandbox.execute(conn, sql)
+    """
+
+    def __init__(self, timeout: float = SANDBOX_TIMEOUT_SECONDS, max_vm_steps: int = SANDBOX_MAX_VM_STEPS,
+                 max_rows: int = SANDBOX_MAX_ROWS, max_value_bytes: int = SANDBOX_MAX_VALUE_BYTES,
+                 readable_tables=SANDBOX_READABLE_TABLES):
+        self.timeout = timeout
+        self.max_vm_steps = max_vm_steps
+        self.max_rows = max_rows
+        self.max_value_bytes = max_value_bytes
+        self.readable_tables = set(readable_tables)
+
+    @contextmanager
+    def _guard(self, conn: sqlite3.Connection):
+        """Install the authorizer, progress handler and length limit for the duration of a query."""
+        denied = []
+        stopped = []
+        steps = 0
+        deadline = time.monotonic() + self.timeout
+
+        def authorize(action, arg1, arg2, db_name, trigger_name):
+            if action in _ALLOWED_ACTIONS:
+                return sqlite3.SQLITE_OK
+            if action == sqlite3.SQLITE_FUNCTION and (arg2 or "").lower() in SANDBOX_ALLOWED_FUNCTIONS:
+                return sqlite3.SQLITE_OK
+            if action == sqlite3.SQLITE_READ and (arg1 in self.readable_tables or db_name is None):
+                # Reads without a database are of CTEs, including recursive ones, not tables
+                return sqlite3.SQLITE_OK
+            denied.append(f"action {action} on {arg1 or arg2}")
+            return sqlite3.SQLITE_DENY
+
+        def progress():
+            nonlocal steps
+            steps += SANDBOX_PROGRESS_INTERVAL
+            if steps > self.max_vm_steps:
+                stopped.append(f"exceeded {self.max_vm_steps} VM steps")
+                return 1
+            if time.monotonic() > deadline:
+                stopped.append(f"exceeded {self.timeout}s")
+                return 1
+            return 0
+
+        has_limits = hasattr(conn, "setlimit")  # Python 3.11+
+        conn.set_authorizer(authorize)
+        conn.set_progress_handler(progress, SANDBOX_PROGRESS_INTERVAL)
+        if has_limits:
+            length_limit = conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, self.max_value_bytes)
+        try:
+            yield
+        except sqlite3.DatabaseError as e:
+            if denied:
+                raise QueryRejected(f"Query not allowed: {denied[0]}") from e
+            if stopped:
+                raise QueryRejected(f"Query stopped: {stopped[0]}") from e
+            if isinstance(e, sqlite3.DataError):
+                raise QueryRejected(f"Query stopped: value larger than {self.max_value_bytes} bytes") from e
+            raise
+        finally:
+            conn.set_authorizer(None)
+            conn.set_progress_handler(None, 0)
+            if has_limits:
+                conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, length_limit)
+
+    def validate(self, conn: sqlite3.Connection, query: str) -> bool:
+        """Check that a query is a single read of the allowed tables and compiles against the current schema, without running it."""
+        try:
+            with self._guard(conn):
+                conn.execute(f"EXPLAIN {query}").close()
+            return True
+        except (QueryRejected, sqlite3.Error) as e:
+            print(f"Validation failed: {e}")
+            return False
+
+    def execute(self, conn: sqlite3.Connection, query: str, params=(), sink=None) -> SandboxResult:
+        """
+        Run a query inside the sandbox.
+
+        Args:
+            conn (sqlite3.Connection): A read-only connection, e.g. from the read pool.
+            query (str): A single SELECT statement.
+            params (tuple): Query parameters.
+            sink (optional): Receives the rows as they are fetched instead of collecting them:
+                ``sink.start(columns)``, then ``sink.add(row)`` per row until it returns False
+                (e.g. TSVResultSerializer).
+
+        Returns:
+            SandboxResult: Column names, the collected rows (empty with a sink), the number of
+            rows returned, and whether further rows were left out.
+
+        Raises:
+            QueryRejected: When the query touches anything but the readable tables or exceeds its budget.
+        """
+        rows, row_count, truncated = [], 0, False
+        with self._guard(conn):
+            cursor = conn.execute(query, params)
+            try:
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                if sink is not None:
+                    sink.start(columns)
+                while not truncated:
+                    batch = cursor.fetchmany(SANDBOX_FETCH_BATCH)
+                    if not batch:
+                        break
+                    for row in batch:
+                        if row_count >= self.max_rows or (sink is not None and not sink.add(row)):
+                            truncated = True
+                            break
+                        if sink is None:
+                            rows.append(row)
+                        row_count += 1
+            finally:
+                cursor.close()
+        return SandboxResult(columns, rows, row_count, truncated)
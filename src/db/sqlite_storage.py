@@ -1,10 +1,10 @@
 import os
-import sqlite3
 from typing import Any, Dict, Union
 
 from chainlit import make_async
 from chainlit.data.storage_clients.base import BaseStorageClient
 from chainlit.logger import logger
+from src.db.engine import connect
 
 service_host = os.getenv("SERVICE_HOST", "http://localhost:8000")
 
@@ -17,7 +17,7 @@ class SQLiteStorageClient(BaseStorageClient):
         self.database_path = database_path
         try:
             # Initialize the database and create table if needed
-            conn = sqlite3.connect(self.database_path)
+            conn = connect(self.database_path)
             cursor = conn.cursor()
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS blob_storage (
@@ -35,7 +35,7 @@ class SQLiteStorageClient(BaseStorageClient):
 
     def sync_upload_file(self, object_key: str, data: Union[bytes, str], mime: str = "application/octet-stream") -> Dict[str, Any]:
         try:
-            conn = sqlite3.connect(self.database_path)
+            conn = connect(self.database_path)
             cursor = conn.cursor()
             
             uuid = object_key.split('/')[0]
@@ -59,7 +59,7 @@ class SQLiteStorageClient(BaseStorageClient):
 
     def sync_download_file(self, object_key: str) -> str:
         try:
-            conn = sqlite3.connect(self.database_path)
+            conn = connect(self.database_path)
             cursor = conn.cursor()
             
             cursor.execute("SELECT data FROM blob_storage WHERE object_key = ?", (object_key,))
@@ -84,7 +84,7 @@ class SQLiteStorageClient(BaseStorageClient):
 
     def sync_delete_file(self, object_key: str) -> bool:
         try:
-            conn = sqlite3.connect(self.database_path)
+            conn = connect(self.database_path)
             cursor = conn.cursor()
             
             uuid = object_key.split('/')[0]
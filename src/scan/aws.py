@@ -4,9 +4,9 @@ import json
 import yaml
 from typing import Optional, List
 import pandas as pd
-from src.scan.cvss_score import generate_cvss, safe_cvss_score
+from src.scan.cvss_score import score_issues
 
-from src.scan.util import run_command_and_read_output, run_command_bg, JSONParseError
+from src.scan.util import run_command_and_read_output, run_command_bg, JSONParseError, iter_report_items, chunked, REPORT_CHUNK_SIZE
 from prettytable import PrettyTable
 AWS_REPORT_PATH = "/tmp/trivy_aws_full.json"
 
@@ -27,7 +27,7 @@ def scan_aws(
         result = run_command_bg(command)
     else:
         # Run the command and return the parsed output
-        result = run_command_and_read_output(command=command, output_file=report)
+        result = run_command_and_read_output(command=command, output_file=report, load=False)
     return result
 
 def read_aws_full_report():
@@ -37,10 +37,10 @@ def read_aws_full_report():
         except json.JSONDecodeError:
             raise JSONParseError(AWS_REPORT_PATH)
 
-def aws_short_yaml(report:dict):
+def aws_short_yaml(report):
     output = ""
     miscs = {}
-    for res in report["Results"]:
+    for res in iter_report_items(report, "Results"):
         if "Misconfigurations" in res:
             for mis in res["Misconfigurations"]:
                 if mis["AVDID"] not in miscs:
@@ -56,12 +56,12 @@ def aws_short_yaml(report:dict):
         output = output + "\n\n" + yaml.dump(v)
     return output
 
-def aws_short_table(report:dict):
+def aws_short_table(report):
     table = PrettyTable()
     table.field_names = ["ID","Title", "Severity", "Resolution", "Resources"]
     output = ""
     miscs = {}
-    for res in report["Results"]:
+    for res in iter_report_items(report, "Results"):
         if "Misconfigurations" in res:
             for mis in res["Misconfigurations"]:
                 if mis["AVDID"] not in miscs:
@@ -79,19 +79,24 @@ def aws_short_table(report:dict):
 
     return table.get_string()
 
-# Return dataframe from report
-def process_aws_scan(report: dict):
-    data = []
-    for result in report["Results"]:
-        misconfigurations = result.get("Misconfigurations", [])
+# Yield one row per misconfiguration of an aws report (dict or path on disk),
+# deduplicated by id and resource name
+def iter_aws_misconfigurations(report):
+    seen = set()
+    for result in iter_report_items(report, "Results"):
+        misconfigurations = result.get("Misconfigurations") or []
         for misconfig in misconfigurations:
             cause_metadata = misconfig.get("CauseMetadata", {})
             resource_name = cause_metadata.get("Resource") or "{}_{}".format(
                 cause_metadata.get("Provider", ""),
                 cause_metadata.get("Service", ""),
             )
+            key = (misconfig.get("ID", ""), resource_name)
+            if key in seen:
+                continue
+            seen.add(key)
             service_name = cause_metadata.get("Service", "")
-            data.append({
+            yield {
                 "type": "AWS",
                 "id": misconfig.get("ID", ""),
                 "resource_name": resource_name,
@@ -103,30 +108,28 @@ def process_aws_scan(report: dict):
                 "severity": misconfig.get("Severity", ""),
                 "message": misconfig.get("Message", ""),
                 "cause_metadata": json.dumps(cause_metadata)
-            })
-    df = pd.DataFrame(data)
-    # Deduplicate by id and resource name
-    df = df.drop_duplicates(subset=["id", "resource_name"])
-    return df
+            }
+
+# Return dataframe from report
+def process_aws_scan(report):
+    return pd.DataFrame(iter_aws_misconfigurations(report))
 
 async def gen_aws_score(aws_df):
     sub_aws_df = aws_df[["avdid", "title", "description", "resolution", "severity", "message"]]
     sub_aws_df = sub_aws_df.drop_duplicates(subset=["avdid"])
 
-    # Generate CVSS strings asynchronously
-    cvss_strings = []
-    for _, row in sub_aws_df.iterrows():
-        cvss_strings.append(await generate_cvss(row))
-    sub_aws_df["cvss_strings"] = cvss_strings
-
-    # Calculate CVSS scores
-    sub_aws_df["risk_score"] = sub_aws_df["cvss_strings"].apply(safe_cvss_score)
-    return sub_aws_df
+    # Generate CVSS strings and scores, reusing cached vectors
+    return await score_issues(sub_aws_df)
 
-# Combine the aws scan results with the CVSS scores
-async def gen_aws_db_content(aws_report, cols):
-    aws_df = process_aws_scan(aws_report)
-    res = await gen_aws_score(aws_df)
-    aws_df = aws_df.merge(res[["avdid", "cvss_strings", "risk_score"]], on="avdid", how="left")
-    aws_df = aws_df[cols]
-    return aws_df
+# Stream the aws scan results as DataFrame chunks combined with the CVSS scores
+async def iter_aws_db_content(aws_report, cols, chunk_size=REPORT_CHUNK_SIZE):
+    scores = None
+    for chunk in chunked(iter_aws_misconfigurations(aws_report), chunk_size):
+        aws_df = pd.DataFrame(chunk)
+        # Only score checks that were not seen in a previous chunk
+        new_df = aws_df if scores is None else aws_df[~aws_df["avdid"].isin(scores["avdid"])]
+        if not new_df.empty:
+            res = (await gen_aws_score(new_df))[["avdid", "cvss_strings", "risk_score"]]
+            scores = res if scores is None else pd.concat([scores, res], ignore_index=True)
+        aws_df = aws_df.merge(scores, on="avdid", how="left")
+        yield aws_df[cols]
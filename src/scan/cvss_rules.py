@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+# Add the parent directory to sys.path to be able to import from src
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from cvss import CVSS3
+from src.db.config import DEFAULT_DB_PATH, RESULTS_DB_PATH
+from src.db.engine import connect
+
+# Precomputed CVSS vectors of known Trivy checks (AVD-KSV-*, AVD-AWS-*), keyed by avdid.
+# These checks are fixed rules, so their vector does not depend on the scanned resource.
+CVSS_RULES_PATH = os.getenv("CVSS_RULES_PATH", "./src/config/cvss_vectors.json")
+
+_rules = {}
+
+def load_cvss_rules(path: str = CVSS_RULES_PATH) -> dict:
+    """
+    Load the precomputed avdid to CVSS vector table, once per path.
+
+    Returns:
+        dict: Mapping of avdid to CVSS vector string; empty when the file is missing.
+    """
+    if path not in _rules:
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                _rules[path] = json.load(file)
+        except FileNotFoundError:
+            _rules[path] = {}
+        except json.JSONDecodeError as e:
+            print(f"Error reading CVSS rules {path}: {e}")
+            _rules[path] = {}
+    return _rules[path]
+
+def _is_valid_vector(cvss_string) -> bool:
+    try:
+        CVSS3(cvss_string)
+        return True
+    except Exception:
+        return False
+
+def _table_exists(conn, table: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+def collect_scored_vectors(db_path: str = DEFAULT_DB_PATH, results_db_path: str = RESULTS_DB_PATH) -> dict:
+    """
+    Collect the CVSS vectors produced by previous scoring runs.
+
+    The most recent cvss_cache entry of an avdid wins; avdids only found in the
+    results table use their most common vector.
+
+    Args:
+        db_path (str): Path to the database holding the cvss_cache table.
+        results_db_path (str): Path to the database holding the results table.
+
+    Returns:
+        dict: Mapping of avdid to CVSS vector string.
+    """
+    vectors = {}
+    if os.path.exists(results_db_path):
+        conn = connect(results_db_path, read_only=True)
+        try:
+            if _table_exists(conn, "results"):
+                counts = Counter()
+                for avdid, cvss_string, count in conn.execute(
+                    """SELECT avdid, cvss_strings, COUNT(*) FROM results
+                       WHERE type IN ('KUBERNETES', 'AWS') AND avdid != '' AND cvss_strings IS NOT NULL
+                       GROUP BY avdid, cvss_strings"""
+                ):
+                    if _is_valid_vector(cvss_string):
+                        counts[(avdid, cvss_string)] = count
+                # Walk from least to most common so the most common vector of an avdid wins
+                for (avdid, cvss_string), _ in counts.most_common()[::-1]:
+                    vectors[avdid] = cvss_string
+        finally:
+            conn.close()
+
+    conn = connect(db_path)
+    try:
+        if _table_exists(conn, "cvss_cache"):
+            for avdid, cvss_string in conn.execute(
+                "SELECT avdid, cvss_strings FROM cvss_cache WHERE avdid != '' ORDER BY created_at"
+            ):
+                if _is_valid_vector(cvss_string):
+                    vectors[avdid] = cvss_string
+        return vectors
+    finally:
+        conn.close()
+
+def rebuild_cvss_rules(db_path: str = DEFAULT_DB_PATH, output: str = CVSS_RULES_PATH, replace: bool = False, results_db_path: str = RESULTS_DB_PATH) -> int:
+    """
+    Rebuild the precomputed vector table from previous scoring runs.
+
+    Args:
+        db_path (str): Path to the database holding the cvss_cache table.
+        output (str): Path of the JSON table to write.
+        replace (bool): Discard the existing table instead of merging into it.
+        results_db_path (str): Path to the database holding the results table.
+
+    Returns:
+        int: Number of avdids in the written table.
+    """
+    rules = {} if replace else dict(load_cvss_rules(output))
+    rules.update(collect_scored_vectors(db_path, results_db_path))
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(dict(sorted(rules.items())), file, indent=4)
+        file.write("\n")
+    _rules.pop(output, None)
+    return len(rules)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild the precomputed CVSS vector table of known Trivy checks from previous scoring runs."
+    )
+    parser.add_argument("db_path", type=str, nargs="?", default=DEFAULT_DB_PATH, help="Path to the database holding the CVSS cache")
+    parser.add_argument(
+        "--results-db", type=str, default=None,
+        help="Path to the database holding the results table (default: RESULTS_DB_PATH, or db_path when the results share the main database)"
+    )
+    parser.add_argument("--output", type=str, default=CVSS_RULES_PATH, help="Path of the JSON vector table")
+    parser.add_argument("--replace", action="store_true", help="Discard existing entries instead of merging")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        print(f"Database file not found at {args.db_path}")
+        return 1
+    results_db = args.results_db or (args.db_path if RESULTS_DB_PATH == DEFAULT_DB_PATH else RESULTS_DB_PATH)
+    count = rebuild_cvss_rules(args.db_path, args.output, args.replace, results_db)
+    print(f"Wrote {count} CVSS vectors to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,285 @@
 import os
 import json
+import hashlib
+import random
+import time
+from functools import lru_cache
 from typing import Optional
 import yaml
 import asyncio
 import csv
 from langchain_openai import ChatOpenAI
 from langchain_nvidia_ai_endpoints import ChatNVIDIA
+from openai import RateLimitError
 
 from src.utils.utils import reasoning_prompt, load_chat_model, read_file_prompt
+from src.scan.util import count_gpt_tokens
+from src.db.db_util import get_cached_cvss, put_cached_cvss
+from src.scan.cvss_rules import load_cvss_rules
 
 import pandas as pd
 from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
 from cvss import CVSS2, CVSS3, CVSS4
 
 model = load_chat_model()
+MODEL_NAME = getattr(model, "model_name", None) or os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
 
-# Function to generate CVSS strings asynchronously
-async def generate_cvss(row):
+ISSUE_SCORING_PROMPT_PATH = "./src/prompts/issue_scoring_prompt.txt"
+BATCH_ISSUE_SCORING_PROMPT_PATH = "./src/prompts/batch_issue_scoring_prompt.txt"
+CYBERSECURITY_SYSTEM_PROMPT_PATH = "./src/prompts/cybersecurity_system_prompt.txt"
+
+# Maximum number of CVSS scoring requests in flight at the same time
+CVSS_SCORING_CONCURRENCY = int(os.getenv("CVSS_SCORING_CONCURRENCY", "8"))
+# Retries and base delay (seconds, doubled on each retry) when the provider rate limits us
+CVSS_SCORING_MAX_RETRIES = int(os.getenv("CVSS_SCORING_MAX_RETRIES", "5"))
+CVSS_SCORING_BACKOFF = float(os.getenv("CVSS_SCORING_BACKOFF", "1.0"))
+# Score several issues per request; the issues of one request fit in CVSS_BATCH_TOKEN_BUDGET tokens
+CVSS_BATCH_SCORING = os.getenv("CVSS_BATCH_SCORING", "true").lower() in ("1", "true", "yes")
+CVSS_BATCH_TOKEN_BUDGET = int(os.getenv("CVSS_BATCH_TOKEN_BUDGET", "6000"))
+CVSS_BATCH_MAX_ISSUES = int(os.getenv("CVSS_BATCH_MAX_ISSUES", "40"))
+# Number of distinct CVSS vectors whose base score is memoized
+CVSS_SCORE_CACHE_SIZE = int(os.getenv("CVSS_SCORE_CACHE_SIZE", "4096"))
+
+# Ask the model for the CVSS string of a single issue, raising on errors
+async def request_cvss(row):
+    content = reasoning_prompt(ISSUE_SCORING_PROMPT_PATH, ISSUE_DESCRIPTION=json.dumps(row.to_dict()))
+    local_messages = SystemMessage(content=read_file_prompt(CYBERSECURITY_SYSTEM_PROMPT_PATH)), HumanMessage(content=content)
+    response = await model.ainvoke(local_messages)
+    return response.content
+
+# Ask the model for the CVSS strings of several issues at once, raising on errors
+async def request_cvss_batch(rows: pd.DataFrame) -> dict:
+    issues = json.dumps(rows.to_dict(orient="records"))
+    content = reasoning_prompt(BATCH_ISSUE_SCORING_PROMPT_PATH, ISSUES=issues)
+    local_messages = SystemMessage(content=read_file_prompt(CYBERSECURITY_SYSTEM_PROMPT_PATH)), HumanMessage(content=content)
+    response = await model.ainvoke(local_messages)
+    return parse_cvss_batch_response(response.content)
+
+def parse_cvss_batch_response(content: str) -> dict:
+    """
+    Parse the JSON object returned for a batch scoring request.
+
+    Returns:
+        dict: Mapping of avdid to CVSS string; empty when the reply is not a JSON object.
+    """
+    content = content.strip().replace("```json", "").replace("```", "")
     try:
-        content = reasoning_prompt("./src/prompts/issue_scoring_prompt.txt", ISSUE_DESCRIPTION=json.dumps(row.to_dict()))
-        local_messages = SystemMessage(content=read_file_prompt("./src/prompts/cybersecurity_system_prompt.txt")), HumanMessage(content=content)
-        response = await model.ainvoke(local_messages)
-        return response.content
-    except Exception as e:
-        print(f"Error generating CVSS string for row: {row.to_dict()}. Error: {e}")
+        parsed = json.loads(content)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(parsed, dict):
+        return {}
+    return {str(k): v.strip() for k, v in parsed.items() if isinstance(v, str)}
+
+def is_valid_cvss(cvss_string) -> bool:
+    return isinstance(cvss_string, str) and cvss_base_score(cvss_string) is not None
+
+def pack_issue_batches(df: pd.DataFrame, token_budget: int = CVSS_BATCH_TOKEN_BUDGET, max_issues: int = CVSS_BATCH_MAX_ISSUES) -> list:
+    """
+    Split the rows of ``df`` into batches whose serialized issues fit in ``token_budget`` tokens.
+
+    Returns:
+        list[list[int]]: Row positions of each batch, in row order.
+    """
+    batches = []
+    batch, batch_tokens = [], 0
+    for position, record in enumerate(df.to_dict(orient="records")):
+        tokens = count_gpt_tokens(json.dumps(record))
+        if batch and (batch_tokens + tokens > token_budget or len(batch) >= max_issues):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(position)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether a model call failed because the provider rate limited it (HTTP 429)."""
+    if isinstance(error, RateLimitError):
+        return True
+    # Other providers raise their own errors, carrying the status or the HTTP response
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429
+
+class CvssScoringScheduler:
+    """
+    Send CVSS scoring requests concurrently behind a semaphore.
+
+    Rate-limited requests are retried with exponential backoff, results keep the
+    order of the input rows and the latency of every successful call is logged per
+    score() call.
+    In batch mode several issues are scored per request and issues missing from a
+    batch reply fall back to single-issue requests.
+    """
+
+    def __init__(self, concurrency: int = CVSS_SCORING_CONCURRENCY, max_retries: int = CVSS_SCORING_MAX_RETRIES, backoff: float = CVSS_SCORING_BACKOFF, batch: bool = CVSS_BATCH_SCORING):
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.batch = batch
+        self.rate_limited = 0
+        self.requests = 0
+        self.fallbacks = 0
+
+    async def _call(self, request, arg, description: str, latencies: list):
+        for attempt in range(self.max_retries + 1):
+            async with self.semaphore:
+                start = time.perf_counter()
+                try:
+                    self.requests += 1
+                    result = await request(arg)
+                    latencies.append(time.perf_counter() - start)
+                    return result
+                except Exception as e:
+                    if not is_rate_limited(e):
+                        print(f"Error generating CVSS string for {description}. Error: {e}")
+                        return None
+                    self.rate_limited += 1
+                    error = e
+            # Back off outside the semaphore so other requests can proceed
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+        print(f"Giving up on CVSS string for {description} after {self.max_retries} retries. Error: {error}")
         return None
 
-# Function to calculate CVSS scores with error handling
-def safe_cvss_score(cvss_string):
+    async def _score_row(self, row, latencies: list) -> Optional[str]:
+        return await self._call(request_cvss, row, f"row: {row.to_dict()}", latencies)
+
+    async def _score_batch(self, rows: pd.DataFrame, latencies: list) -> list:
+        vectors = await self._call(request_cvss_batch, rows, f"batch: {list(rows['avdid'])}", latencies) or {}
+        results = []
+        for _, row in rows.iterrows():
+            vector = vectors.get(str(row["avdid"]))
+            if vector is None or not is_valid_cvss(vector):
+                self.fallbacks += 1
+                vector = await self._score_row(row, latencies)
+            results.append(vector)
+        return results
+
+    async def score(self, df: pd.DataFrame) -> list:
+        """
+        Generate the CVSS strings of every row of ``df``.
+
+        Returns:
+            list: One CVSS string (or None on failure) per row, in row order.
+        """
+        start = time.perf_counter()
+        # Latencies of this call only: the scan types are scored concurrently
+        latencies = []
+        if self.batch and len(df) > 1:
+            batches = pack_issue_batches(df)
+            batch_results = await asyncio.gather(*(self._score_batch(df.iloc[positions], latencies) for positions in batches))
+            results = [vector for batch_result in batch_results for vector in batch_result]
+        else:
+            results = await asyncio.gather(*(self._score_row(row, latencies) for _, row in df.iterrows()))
+        self.log_latency(len(results), time.perf_counter() - start, latencies)
+        return results
+
+    @staticmethod
+    def log_latency(count: int, elapsed: float, latencies: list):
+        if not latencies:
+            print(f"Scored {count} issues in {elapsed:.2f}s")
+            return
+        latencies = sorted(latencies)
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"Scored {count} issues with {len(latencies)} requests in {elapsed:.2f}s (call latency p50 {p50:.2f}s, p95 {p95:.2f}s, max {latencies[-1]:.2f}s)")
+
+cvss_scheduler = CvssScoringScheduler()
+
+def cvss_prompt_version() -> str:
+    """Short hash of the prompts used for scoring; changes whenever a scoring prompt file is edited."""
+    digest = hashlib.sha256()
+    for path in (CYBERSECURITY_SYSTEM_PROMPT_PATH, ISSUE_SCORING_PROMPT_PATH, BATCH_ISSUE_SCORING_PROMPT_PATH):
+        digest.update(read_file_prompt(path).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def cvss_cache_key(avdid: str, prompt_version: str, model_name: str = MODEL_NAME) -> str:
+    return hashlib.sha256(f"{avdid}\0{prompt_version}\0{model_name}".encode("utf-8")).hexdigest()
+
+async def score_issues(issues_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the "cvss_strings" and "risk_score" columns to a DataFrame of distinct issues.
+
+    Vectors come from the precomputed table of known checks first, then from the
+    persistent CVSS cache; only the remaining issues are sent to the LLM, and their
+    results are stored back into the cache.
+
+    Args:
+        issues_df (pd.DataFrame): One row per distinct avdid with the columns used by the scoring prompt.
+
+    Returns:
+        pd.DataFrame: A copy of ``issues_df`` with the CVSS strings and scores.
+    """
+    issues_df = issues_df.copy()
+    prompt_version = cvss_prompt_version()
+    keys = [cvss_cache_key(avdid, prompt_version) for avdid in issues_df["avdid"]]
+
+    # Known checks have a fixed vector, no lookup or LLM call needed
+    rules = load_cvss_rules()
+    rule_vectors = pd.Series([rules.get(avdid) for avdid in issues_df["avdid"]], dtype=object)
+    rule_scores = cvss_scores(rule_vectors)
+    cached = {
+        key: (vector, score)
+        for key, vector, score in zip(keys, rule_vectors, rule_scores)
+        if vector is not None and not pd.isna(score)
+    }
+    rule_hits = len(cached)
+    cached.update(await get_cached_cvss([key for key in keys if key not in cached]))
+
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+    generated = await cvss_scheduler.score(issues_df.iloc[missing]) if missing else []
+    print(f"CVSS scoring: {rule_hits} known checks, {len(cached) - rule_hits} cache hits, {len(missing)} LLM scored")
+
+    cvss_strings = [cached[key][0] if key in cached else None for key in keys]
+    risk_scores = [cached[key][1] if key in cached else None for key in keys]
+    generated_scores = cvss_scores(pd.Series(generated, dtype=object))
+    new_entries = []
+    for i, cvss_string, risk_score in zip(missing, generated, generated_scores):
+        cvss_strings[i] = cvss_string
+        risk_scores[i] = None if pd.isna(risk_score) else risk_score
+        # Failed or unparsable responses are not cached so they get retried next import
+        if risk_scores[i] is not None:
+            new_entries.append({
+                "cache_key": keys[i],
+                "avdid": issues_df["avdid"].iloc[i],
+                "prompt_version": prompt_version,
+                "model_name": MODEL_NAME,
+                "cvss_strings": cvss_string,
+                "risk_score": risk_scores[i],
+            })
+    await put_cached_cvss(new_entries)
+
+    issues_df["cvss_strings"] = cvss_strings
+    issues_df["risk_score"] = risk_scores
+    return issues_df
+
+@lru_cache(maxsize=CVSS_SCORE_CACHE_SIZE)
+def cvss_base_score(cvss_string: str) -> Optional[float]:
+    """Base score of a CVSS 3.x vector string, or None when the vector is invalid. Memoized."""
     try:
-        return CVSS3(cvss_string).scores()[0] if cvss_string else None
-    except Exception as e:
-        print(f"Error processing CVSS string: {cvss_string}. Error: {e}")
+        return float(CVSS3(cvss_string).scores()[0])
+    except Exception:
         return None
+
+def cvss_scores(cvss_strings: pd.Series) -> pd.Series:
+    """
+    Column-at-a-time CVSS scoring: compute the base score of each distinct vector once.
+
+    Empty values score as NaN. Invalid vectors also score as NaN and are reported in a
+    single summary line instead of once per row.
+
+    Args:
+        cvss_strings (pd.Series): CVSS vector strings.
+
+    Returns:
+        pd.Series: Float base scores aligned with ``cvss_strings``.
+    """
+    vectors = cvss_strings[cvss_strings.map(lambda v: isinstance(v, str) and v != "")]
+    scores = {vector: cvss_base_score(vector) for vector in vectors.unique()}
+    invalid = [vector for vector, score in scores.items() if score is None]
+    if invalid:
+        invalid_rows = int(vectors.isin(invalid).sum())
+        print(f"Invalid CVSS strings: {invalid_rows} rows, {len(invalid)} distinct (e.g. {invalid[:3]})")
+    return cvss_strings.map(scores).astype(float)
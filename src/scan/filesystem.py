@@ -10,6 +10,9 @@ from src.scan.util import (
     get_severity,
     run_command_bg,
     JSONParseError,
+    iter_report_items,
+    chunked,
+    REPORT_CHUNK_SIZE,
 )
 
 FS_REPORT_PATH = "/tmp/trivy_code_full.json"
@@ -56,7 +59,7 @@ def scan_filesystem(
     if bg:
         result = run_command_bg(command)
     else:
-        result = run_command_and_read_output(command=command, output_file=report)
+        result = run_command_and_read_output(command=command, output_file=report, load=False)
     return result
 
 
@@ -186,12 +189,14 @@ def get_purl_or_pkgid(data):
     else:
         return data['PkgID']
 
-async def process_code_scan(report: dict, type="CODE"):
-    data = []
-    for result in report["Results"]:
+# Yield one row per vulnerability of a code/container report (dict or path on disk)
+def iter_code_vulnerabilities(report, type="CODE"):
+    for result in iter_report_items(report, "Results"):
         target = result.get("Target", "")
-        vulnerabilities = result.get("Vulnerabilities", [])
+        vulnerabilities = result.get("Vulnerabilities") or []
         for vul in vulnerabilities:
+            risk_score = 0
+            cvss_strings = ""
             if "CVSS" in vul:
                 if "nvd" in vul["CVSS"]:
                     risk_score = vul["CVSS"]["nvd"].get("V3Score", 0)
@@ -202,7 +207,7 @@ async def process_code_scan(report: dict, type="CODE"):
                 elif "redhat" in vul["CVSS"]:
                     risk_score = vul["CVSS"]["redhat"].get("V3Score", 0)
                     cvss_strings = vul["CVSS"]["redhat"].get("V3Vector", "")
-            data.append({
+            yield {
                 "type": type,
                 "id": vul.get("VulnerabilityID", ""),
                 "resource_name": get_purl_or_pkgid(vul),
@@ -216,7 +221,9 @@ async def process_code_scan(report: dict, type="CODE"):
                 "cvss_strings": cvss_strings,
                 "risk_score": risk_score,
                 "cause_metadata": target
-            })
+            }
 
-    df = pd.DataFrame(data)
-    return df
+# Stream the code/container scan results as DataFrame chunks
+async def iter_code_scan(report, type="CODE", chunk_size=REPORT_CHUNK_SIZE):
+    for chunk in chunked(iter_code_vulnerabilities(report, type=type), chunk_size):
+        yield pd.DataFrame(chunk)
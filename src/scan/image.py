@@ -58,7 +58,7 @@ def scan_image(
     if bg:
         result = run_command_bg(command)
     else:
-        result = run_command_and_read_output(command=command, output_file=report)
+        result = run_command_and_read_output(command=command, output_file=report, load=False)
     return result
 
 def read_image_full_report():
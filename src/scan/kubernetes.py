@@ -10,6 +10,10 @@ from src.scan.util import (
     count_gpt_tokens,
     run_command_bg,
     JSONParseError,
+    iter_report_items,
+    read_report_field,
+    chunked,
+    REPORT_CHUNK_SIZE,
 )
 import pandas as pd
 from tqdm import tqdm
@@ -20,7 +24,7 @@ from langchain.prompts import PromptTemplate
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
 import logging
 import uvicorn
-from src.scan.cvss_score import generate_cvss, safe_cvss_score
+from src.scan.cvss_score import score_issues
 
 logger = logging.getLogger('uvicorn.error')
 ISSUE_SCORING_PROMPT_PATH = "issue_scoring_prompt.txt"
@@ -39,10 +43,10 @@ def read_k8s_full_report():
         except json.JSONDecodeError:
             raise JSONParseError(K8S_REPORT_PATH)
 
-def k8s_resource_misconfigure(report:dict, resource:str):
-    cluster_name = report["ClusterName"]
+def k8s_resource_misconfigure(report, resource:str):
+    cluster_name = read_report_field(report, "ClusterName")
     output = f"Cluster_Name: {cluster_name}\n"
-    for item in report["Resources"]:
+    for item in iter_report_items(report, "Resources"):
         kind = item["Kind"]
         name = item["Name"]
         full_name = f"{kind}/{name}"
@@ -64,11 +68,11 @@ def k8s_resource_misconfigure(report:dict, resource:str):
     #print(output)
     return output
 
-def k8s_all_resource_misconfigure(report:dict):
-    cluster_name = report["ClusterName"]
+def k8s_all_resource_misconfigure(report):
+    cluster_name = read_report_field(report, "ClusterName")
     output = f"Cluster_Name: {cluster_name}\n"
     miscs = {}
-    for item in report["Resources"]:
+    for item in iter_report_items(report, "Resources"):
         kind = item["Kind"]
         name = item["Name"]
         full_name = f"{kind}/{name}"
@@ -122,12 +126,10 @@ def get_compliance_report(report: dict):
     return output
 
 def get_kubernetes_summary():
-    report = read_k8s_full_report()
-    return k8s_all_resource_misconfigure(report)
+    return k8s_all_resource_misconfigure(K8S_REPORT_PATH)
 
 def get_kubernetes_resource(name: dict)-> str:
-    report = read_k8s_full_report()
-    return k8s_resource_misconfigure(report, name)
+    return k8s_resource_misconfigure(K8S_REPORT_PATH, name)
 ""
 def scan_kubernetes(report: str = K8S_REPORT_PATH, config_path:str = "./kube/config", bg:bool = False):
     ###chainlit###
@@ -164,19 +166,16 @@ def scan_kubernetes(report: str = K8S_REPORT_PATH, config_path:str = "./kube/con
     if bg:
         result = run_command_bg(command)
     else:
-        result= run_command_and_read_output(command=command, output_file=report)
+        result= run_command_and_read_output(command=command, output_file=report, load=False)
     return result
 
 
 ###CHAINLIT###
-# Group the k8s scan results with the option to include/exclude metadata
-def process_k8s_scan(k8s_report_data, exclude_metadata=True, grouping=True):
-    # Extract rows
-    rows = []
-    for resource in k8s_report_data["Resources"]:
-        kind = resource["Kind"]
+# Yield one row per failed misconfiguration of a k8s report (dict or path on disk)
+def iter_k8s_misconfigurations(k8s_report_data, exclude_metadata=True):
+    for resource in iter_report_items(k8s_report_data, "Resources"):
         name = resource["Name"]
-        for result in resource.get("Results", []):
+        for result in resource.get("Results") or []:
             if result["MisconfSummary"]["Failures"] > 0:
                 for misconf in result.get("Misconfigurations", []):
                     cause_metadata = misconf.get("CauseMetadata", {})
@@ -185,7 +184,7 @@ def process_k8s_scan(k8s_report_data, exclude_metadata=True, grouping=True):
                     if exclude_metadata:
                         cause_metadata = {}
                     
-                    rows.append({
+                    yield {
                         "type": "KUBERNETES",
                         "id": misconf["ID"],
                         "resource_name": name,
@@ -197,7 +196,12 @@ def process_k8s_scan(k8s_report_data, exclude_metadata=True, grouping=True):
                         "severity": misconf["Severity"],
                         "message": misconf["Message"],
                         "cause_metadata": json.dumps(cause_metadata)
-                    })
+                    }
+
+# Group the k8s scan results with the option to include/exclude metadata
+def process_k8s_scan(k8s_report_data, exclude_metadata=True, grouping=True):
+    # Extract rows
+    rows = iter_k8s_misconfigurations(k8s_report_data, exclude_metadata=exclude_metadata)
 
     # Create a pandas DataFrame
     df = pd.DataFrame(rows)
@@ -222,20 +226,19 @@ async def gen_k8s_score(k8s_df):
     sub_k8s_df = k8s_df[["avdid", "title", "description", "resolution", "severity", "message"]]
     sub_k8s_df = sub_k8s_df.drop_duplicates(subset=["avdid"])
 
-    # Generate CVSS strings asynchronously
-    cvss_strings = []
-    for _, row in sub_k8s_df.iterrows():
-        cvss_strings.append(await generate_cvss(row))
-    sub_k8s_df["cvss_strings"] = cvss_strings
-
-    # Calculate CVSS scores
-    sub_k8s_df["risk_score"] = sub_k8s_df["cvss_strings"].apply(safe_cvss_score)
-    return sub_k8s_df
-
-# Combine the k8s scan results with the CVSS scores
-async def gen_kubernetes_db_content(k8s_report, cols):
-    k8s_df = process_k8s_scan(k8s_report, exclude_metadata=False, grouping=False)
-    res = await gen_k8s_score(k8s_df)
-    k8s_df = k8s_df.merge(res[["avdid", "cvss_strings", "risk_score"]], on="avdid", how="left")
-    k8s_df = k8s_df[cols]
-    return k8s_df
+    # Generate CVSS strings and scores, reusing cached vectors
+    return await score_issues(sub_k8s_df)
+
+# Stream the k8s scan results as DataFrame chunks combined with the CVSS scores
+async def iter_kubernetes_db_content(k8s_report, cols, chunk_size=REPORT_CHUNK_SIZE):
+    scores = None
+    rows = iter_k8s_misconfigurations(k8s_report, exclude_metadata=False)
+    for chunk in chunked(rows, chunk_size):
+        k8s_df = pd.DataFrame(chunk)
+        # Only score checks that were not seen in a previous chunk
+        new_df = k8s_df if scores is None else k8s_df[~k8s_df["avdid"].isin(scores["avdid"])]
+        if not new_df.empty:
+            res = (await gen_k8s_score(new_df))[["avdid", "cvss_strings", "risk_score"]]
+            scores = res if scores is None else pd.concat([scores, res], ignore_index=True)
+        k8s_df = k8s_df.merge(scores, on="avdid", how="left")
+        yield k8s_df[cols]
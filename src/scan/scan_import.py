@@ -1,53 +1,172 @@
-from src.db.db_util import init_db, batch_upsert_records, query_all_records, export_to_csv
+from src.db.db_util import init_db, bulk_upsert_records, query_all_records, export_to_csv, UpsertWriter, invalidate_cvss_cache, bump_data_version
+import argparse
 import asyncio
+import os
+import time
 from src.scan.scan_result import ScanResult
-from src.db.config import DEFAULT_DB_PATH
-from src.scan.kubernetes import gen_kubernetes_db_content
-from src.scan.filesystem import process_code_scan
-from src.scan.aws import gen_aws_db_content
+from src.db.config import DEFAULT_DB_PATH, RESULTS_DB_PATH
+from src.db.db_shadow import prepare_shadow_db, swap_results_db, remove_db_files
+from src.db.db_index import optimize_results_db_at
+from src.db.db_summary import refresh_results_summaries_at
+from src.scan.kubernetes import iter_kubernetes_db_content
+from src.scan.filesystem import iter_code_scan
+from src.scan.aws import iter_aws_db_content
+from src.scan.util import REPORT_CHUNK_SIZE
+from src.scan.cvss_score import cvss_prompt_version
 
-async def process_and_upsert_scan_results(scan_type: str, scan_result: ScanResult, db_cols: list, process_func=None, **kwargs):
+# Maximum number of scan types imported at the same time
+IMPORT_MAX_PARALLEL = int(os.getenv("IMPORT_MAX_PARALLEL", "4"))
+
+async def process_and_upsert_scan_results(scan_type: str, scan_result: ScanResult, db_cols: list, process_func=None, chunk_size: int = REPORT_CHUNK_SIZE, writer: UpsertWriter = None, **kwargs):
     """
     Process scan results, generate database content, and upsert records.
 
+    The report is streamed from disk and processed in chunks of ``chunk_size`` findings,
+    so memory use does not depend on the size of the report.
+
     Args:
         scan_type (str): The type of scan (e.g., "kubernetes", "aws").
         scan_result (ScanResult): The ScanResult object to retrieve results.
         db_cols (list): List of database columns.
-        process_func (callable, optional): Custom processing function for the scan results.
+        process_func (callable, optional): Custom processing function for the scan results,
+            an async generator yielding DataFrame chunks.
+        chunk_size (int): Number of findings per chunk.
+        writer (UpsertWriter, optional): Shared writer the chunks are queued to; when omitted
+            the chunks are upserted directly.
         **kwargs: Additional arguments for the processing function.
 
     Returns:
-        list: Upserted records.
+        int: Number of upserted rows.
     """
-    report = scan_result.get_scan_result(scan_type)
-    if report == None:
+    report_path = scan_result.get_scan_result_path(scan_type)
+    if report_path == None:
         return None
     try:
         if process_func:
-            df = await process_func(report, **kwargs)
+            chunks = process_func(report_path, chunk_size=chunk_size, **kwargs)
         else:
             print("generate db content===================")
-            df = await globals()[f"gen_{scan_type}_db_content"](report, db_cols)
-        rows = df.to_dict(orient="records")
-        return await batch_upsert_records(rows)
+            chunks = globals()[f"iter_{scan_type}_db_content"](report_path, db_cols, chunk_size=chunk_size)
+        upserted = 0
+        async for df in chunks:
+            rows = df.to_dict(orient="records")
+            if writer:
+                await writer.submit(rows)
+                upserted += len(rows)
+            else:
+                upserted += await bulk_upsert_records(rows)
+        return upserted
     except Exception as e:
         print(e)
         return None
 
-async def initialize_database_and_scans():
-    """Initialize the database, process scan results, and export records to CSV."""
+async def timed_process_and_upsert(semaphore: asyncio.Semaphore, scan_type: str, *args, **kwargs):
+    """
+    Run process_and_upsert_scan_results once a slot of ``semaphore`` is free.
+
+    Returns:
+        tuple: (scan_type, number of upserted rows, wall-clock seconds)
+    """
+    async with semaphore:
+        start = time.perf_counter()
+        upserted = await process_and_upsert_scan_results(scan_type, *args, **kwargs)
+        return scan_type, upserted, time.perf_counter() - start
+
+async def initialize_database_and_scans(max_parallel: int = IMPORT_MAX_PARALLEL, invalidate_cvss: str = None, shadow: bool = False):
+    """
+    Initialize the database and import the scan results of every scan type.
+
+    The kubernetes, aws, code and container imports run concurrently (at most
+    ``max_parallel`` at a time) while their database writes go through a single writer task.
+
+    Args:
+        max_parallel (int): Maximum number of scan types imported at the same time.
+        invalidate_cvss (str, optional): Drop cached CVSS vectors before importing: "stale" for
+            entries of older prompt versions, "all" for every entry, or a prompt version.
+        shadow (bool): Build the results in a shadow database and make it live once complete
+            (see src/db/db_shadow.py), instead of upserting into the live table.
+    """
     # Use the consistent absolute path
     await init_db(DEFAULT_DB_PATH)
+    if RESULTS_DB_PATH != DEFAULT_DB_PATH:
+        await init_db(RESULTS_DB_PATH)
+
+    if invalidate_cvss:
+        current_version = cvss_prompt_version()
+        deleted = await invalidate_cvss_cache(
+            prompt_version=None if invalidate_cvss == "stale" else invalidate_cvss,
+            current_version=current_version
+        )
+        print(f"Removed {deleted} cached CVSS vectors (current prompt version {current_version})")
     
     db_cols = ['type', 'id', 'resource_name', 'service_name', 'avdid', 'title', 'description', 'resolution', 'severity', 'message', 'cvss_strings', 'risk_score', 'cause_metadata']
     scan_result = ScanResult()
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+
+    target_path = await prepare_shadow_db(RESULTS_DB_PATH) if shadow else RESULTS_DB_PATH
 
     # Process different scan types
-    await process_and_upsert_scan_results("kubernetes", scan_result, db_cols)
-    await process_and_upsert_scan_results("aws", scan_result, db_cols)
-    await process_and_upsert_scan_results("code", scan_result, db_cols, process_func=process_code_scan, type="CODE")
-    await process_and_upsert_scan_results("container", scan_result, db_cols, process_func=process_code_scan, type="CONTAINER")
+    start = time.perf_counter()
+    try:
+        async with UpsertWriter(db_path=target_path) as writer:
+            timings = await asyncio.gather(
+                timed_process_and_upsert(semaphore, "kubernetes", scan_result, db_cols, writer=writer),
+                timed_process_and_upsert(semaphore, "aws", scan_result, db_cols, writer=writer),
+                timed_process_and_upsert(semaphore, "code", scan_result, db_cols, writer=writer, process_func=iter_code_scan, type="CODE"),
+                timed_process_and_upsert(semaphore, "container", scan_result, db_cols, writer=writer, process_func=iter_code_scan, type="CONTAINER"),
+            )
+    except Exception:
+        if shadow:
+            remove_db_files(target_path)
+        raise
+
+    for scan_type, upserted, elapsed in timings:
+        print(f"{scan_type:<12} {upserted if upserted is not None else '-':>8} rows {elapsed:8.2f}s")
+    print(f"{'total':<12} {writer.rows_written:>8} rows {time.perf_counter() - start:8.2f}s")
+
+    if shadow:
+        # A report that exists but failed to import would otherwise vanish from the live data
+        failed = [scan_type for scan_type, upserted, _ in timings if upserted is None and scan_result.get_scan_result_path(scan_type)]
+        if failed:
+            remove_db_files(target_path)
+            print(f"Import of {', '.join(failed)} failed, keeping the live results database")
+            return
+
+    # Let running chat apps know the results changed
+    version = await bump_data_version("results", db_path=target_path)
+    if shadow:
+        await swap_results_db(target_path, RESULTS_DB_PATH)
+    else:
+        await asyncio.to_thread(refresh_results_summaries_at, RESULTS_DB_PATH)
+        await asyncio.to_thread(optimize_results_db_at, RESULTS_DB_PATH)
+    print(f"Results data version is now {version}")
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description="Import scan results into the results database")
+    parser.add_argument(
+        "--max-parallel",
+        type=int,
+        default=IMPORT_MAX_PARALLEL,
+        help="Maximum number of scan types imported concurrently."
+    )
+    parser.add_argument(
+        "--invalidate-cvss-cache",
+        nargs="?",
+        const="stale",
+        default=None,
+        metavar="PROMPT_VERSION",
+        help="Drop cached CVSS vectors before importing: entries of older prompt versions "
+             "(default), 'all', or a specific prompt version."
+    )
+    parser.add_argument(
+        "--shadow",
+        action="store_true",
+        help="Build the results in a shadow database and make it live when complete: an atomic "
+             "file swap with a dedicated RESULTS_DB_PATH, an in-place copy in one transaction "
+             "when the results share the chat database."
+    )
+    return parser.parse_args()
 
 if __name__ == '__main__':
-    asyncio.run(initialize_database_and_scans())
+    args = arg_parse()
+    asyncio.run(initialize_database_and_scans(max_parallel=args.max_parallel, invalidate_cvss=args.invalidate_cvss_cache, shadow=args.shadow))
@@ -6,17 +6,6 @@ from src.scan.filesystem import scan_filesystem
 from src.scan.image import scan_image
 from src.scan.aws import scan_aws
 import yaml
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from src.db.config import DEFAULT_DB_PATH
-
-# Create an async engine; using the "aiosqlite" dialect for SQLite.
-DATABASE_URL = f"sqlite+aiosqlite:///{DEFAULT_DB_PATH}"
-engine = create_async_engine(DATABASE_URL, echo=True)
-
-# Create a session maker for async sessions.
-AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-
 
 class ReportFormatException(Exception):
     """Exception raised when format not standard JSON."""
@@ -89,16 +78,30 @@ class ScanResult:
         if not os.path.exists(file_path):
             return None
 
+        if component_name and resource_type == "kubernetes":
+            return k8s_resource_misconfigure(file_path, component_name)
+
         with open(file_path, 'r') as f:
             try:
                 data = json.load(f)
             except json.decoder.JSONDecodeError:
                 raise ReportFormatException()
-            if component_name and resource_type == "kubernetes":
-                return k8s_resource_misconfigure(data, component_name)
             return data
         return None
 
+    def get_scan_result_path(self, resource_type: str, resource_name: str = "default") -> Optional[str]:
+        """
+        Get the path of the stored scan report without loading it, so it can be streamed.
+
+        :param resource_type: The type of resource (e.g., 'code', 'container', 'kubernetes', 'aws').
+        :param resource_name: The name of the resource.
+        :return: The report file path or None if not found.
+        """
+        file_path = self._get_file_path(resource_type, resource_name)
+        if not os.path.exists(file_path):
+            return None
+        return file_path
+
     def scan(self, resource_type: str, config_path: Optional[str] = "/tmp/tmcybertron/agent.yaml", bg: bool = False):
         scan_config = get_scan_config(config_path)
         if resource_type == "code" and scan_config["code"]:
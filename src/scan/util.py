@@ -3,12 +3,18 @@ import os
 import sys
 import io
 import json
-import tiktoken
 import json
+import ijson
+from itertools import islice
 import pandas as pd
 from prettytable import PrettyTable
 from importlib import resources
 
+from src.utils.utils import get_encoding
+
+# Number of findings turned into one DataFrame when streaming a report
+REPORT_CHUNK_SIZE = int(os.getenv("REPORT_CHUNK_SIZE", "5000"))
+
 # Filter rows based on severity
 def filter_severity(df, severity_levels, min_count=5):
     filtered_df = df[df["Severity"].isin(severity_levels)]
@@ -20,14 +26,8 @@ def sanitize_input(input_text: str) -> str:
 
 
 def count_gpt_tokens(text, model_name="gpt-4o"):
-    # Initialize the encoder for the specified model
-    encoder = tiktoken.encoding_for_model(model_name)
-
-    # Encode the text into tokens
-    tokens = encoder.encode(text)
-
-    # Return the number of tokens
-    return len(tokens)
+    # Encode the text into tokens with the cached encoder of the model
+    return len(get_encoding(model_name).encode(text))
 
 class NoOutputError(Exception):
     """Exception raised when the expected output file is not found."""
@@ -44,9 +44,20 @@ class JSONParseError(Exception):
         self.message = f"Failed to parse JSON file '{filename}'."
         super().__init__(self.message)
 
-def run_command_and_read_output(command: list, output_file: str) -> dict:
+def run_command_and_read_output(command: list, output_file: str, load: bool = True):
+    """
+    Run a scan command and return its JSON report.
+
+    :param command: The command to run.
+    :param output_file: The report file written by the command.
+    :param load: Parse the report into memory; when False only the path is returned
+                 so callers can stream it with iter_report_items().
+    :return: The parsed report, or the report path when load is False.
+    """
     subprocess.run(command, check=True)
     if os.path.exists(output_file):
+        if not load:
+            return output_file
         with open(output_file, "r") as file:
             try:
                 return json.load(file)
@@ -55,6 +66,53 @@ def run_command_and_read_output(command: list, output_file: str) -> dict:
     else:
         raise NoOutputError(output_file)
 
+def iter_report_items(report, key: str):
+    """
+    Yield the items of a top-level array (e.g. "Resources" or "Results") of a Trivy report.
+
+    :param report: Either an already loaded report dict or the path of a JSON report on disk.
+                   Reports on disk are parsed incrementally, one array item at a time, so
+                   memory use does not grow with the size of the report.
+    :param key: The name of the top-level array.
+    """
+    if isinstance(report, dict):
+        yield from report.get(key) or []
+        return
+
+    with open(report, "rb") as file:
+        try:
+            yield from ijson.items(file, f"{key}.item", use_float=True)
+        except ijson.JSONError:
+            raise JSONParseError(report)
+
+def read_report_field(report, key: str, default=None):
+    """
+    Return a top-level scalar field (e.g. "ClusterName") of a Trivy report.
+
+    :param report: Either an already loaded report dict or the path of a JSON report on disk.
+    :param key: The name of the field.
+    :param default: Value returned when the field is missing.
+    """
+    if isinstance(report, dict):
+        return report.get(key, default)
+
+    with open(report, "rb") as file:
+        try:
+            for value in ijson.items(file, key, use_float=True):
+                return value
+        except ijson.JSONError:
+            raise JSONParseError(report)
+    return default
+
+def chunked(iterable, size: int):
+    """Yield successive lists of at most ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
 
 def extract_code_to_buffer(file_path, start_line, end_line):
     """
@@ -0,0 +1,108 @@
+import sys
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+def estimate_size(value) -> int:
+    """
+    Rough in-memory size of a cached value in bytes. DataFrames are measured deeply,
+    containers are summed over their items.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """
+    In-process least-recently-used cache bounded by entry count and estimated memory,
+    with an optional time to live. Values are shared between callers and must be treated
+    as read-only.
+
+    Usage:
+        cache = LRUCache(max_entries=32, max_bytes=64 * 1024 * 1024)
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            cache.put(key, value)
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = None, ttl: float = None, sizeof=estimate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (value, size, stored_at)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, count=False) is not None
+
+    def get(self, key, default=None, count: bool = True):
+        """Return the cached value of ``key`` and mark it as recently used, or ``default``."""
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl is not None and time.monotonic() - entry[2] > self.ttl:
+            self._remove(key)
+            entry = None
+        if entry is None:
+            if count:
+                self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        if count:
+            self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        """Store a value, evicting least recently used entries to stay within the bounds."""
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Would evict everything else and still not fit
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, size, time.monotonic())
+        self.current_bytes += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.current_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def discard(self, predicate):
+        """Remove every entry whose key satisfies ``predicate``; returns the number removed."""
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> dict:
+        """Counters for logging and metrics."""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
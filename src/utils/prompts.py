@@ -0,0 +1,66 @@
+import glob
+import os
+import threading
+
+from langchain.prompts import PromptTemplate
+
+# Directory of the prompt files, loaded once at startup
+PROMPTS_DIR = os.getenv("PROMPTS_DIR", "./src/prompts")
+# Check the modification time of a prompt file on every use and reload it when it changed
+PROMPT_HOT_RELOAD = os.getenv("PROMPT_HOT_RELOAD", "false").lower() in ("1", "true", "yes")
+
+class PromptRegistry:
+    """
+    Prompt files read once and kept with their compiled PromptTemplate, so nodes and
+    scoring format a cached template without file I/O. Every file under ``directory`` is
+    loaded up front; other paths are loaded on first use. With ``hot_reload``, a file whose
+    modification time changed is read again.
+
+    Usage:
+        registry = PromptRegistry()
+        content = registry.template("./src/prompts/summary_prompt.txt").format(category=..., ...)
+    """
+
+    def __init__(self, directory: str = PROMPTS_DIR, hot_reload: bool = PROMPT_HOT_RELOAD):
+        self.directory = directory
+        self.hot_reload = hot_reload
+        self._entries = {}  # real path -> [mtime, text, template]
+        self._lock = threading.Lock()
+        self.load_all()
+
+    def load_all(self) -> int:
+        """(Re)load every prompt file of the directory; returns the number of files."""
+        paths = sorted(glob.glob(os.path.join(self.directory, "*.txt")))
+        for path in paths:
+            self._load(os.path.realpath(path))
+        return len(paths)
+
+    def _load(self, key: str):
+        with open(key, "r", encoding="utf-8") as file:
+            mtime = os.fstat(file.fileno()).st_mtime_ns
+            text = file.read()
+        # Compiled on first use: some prompts are plain text with literal braces
+        entry = [mtime, text, None]
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def _entry(self, path: str):
+        key = os.path.realpath(path)
+        entry = self._entries.get(key)
+        if entry is None or (self.hot_reload and os.stat(key).st_mtime_ns != entry[0]):
+            entry = self._load(key)
+        return entry
+
+    def text(self, path: str) -> str:
+        """Content of a prompt file. Raises OSError when it cannot be read."""
+        return self._entry(path)[1]
+
+    def template(self, path: str) -> PromptTemplate:
+        """Compiled template of a prompt file. Raises OSError when it cannot be read."""
+        entry = self._entry(path)
+        if entry[2] is None:
+            entry[2] = PromptTemplate.from_template(entry[1])
+        return entry[2]
+
+prompt_registry = PromptRegistry()
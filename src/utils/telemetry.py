@@ -0,0 +1,206 @@
+import functools
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.utils.utils import messages_token_count, token_count
+
+# Per-node telemetry of the LangGraph workflow: wall time, time to first token, prompt and
+# completion tokens and DB time of every node run are kept in a ring buffer and exposed
+# in Prometheus text format (see render_prometheus and the /metrics route).
+
+# Node runs kept for the quantiles
+TELEMETRY_BUFFER_SIZE = int(os.getenv("TELEMETRY_BUFFER_SIZE", "2048"))
+# Quantiles reported per node
+TELEMETRY_QUANTILES = (0.5, 0.9, 0.99)
+# Encoding used when the model does not report token usage
+TELEMETRY_TOKEN_MODEL = "gpt-4o"
+
+NodeRun = namedtuple("NodeRun", [
+    "node", "started_at", "wall_seconds", "ttft_seconds", "prompt_tokens", "completion_tokens", "db_seconds", "error",
+])
+
+class NodeSpan:
+    """Measurements of one running node, filled in by the callback handler and db_timer."""
+
+    def __init__(self, node: str):
+        self.node = node
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.db_seconds = 0.0
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def finish(self, error: bool) -> NodeRun:
+        ttft = self.first_token_at - self.start if self.first_token_at is not None else None
+        return NodeRun(
+            self.node, self.started_at, time.perf_counter() - self.start, ttft,
+            self.prompt_tokens, self.completion_tokens, self.db_seconds, error,
+        )
+
+_current_span = ContextVar("telemetry_span", default=None)
+_runs = deque(maxlen=TELEMETRY_BUFFER_SIZE)
+# Cumulative per-node totals: node -> [count, errors, wall, ttft count, ttft, prompt, completion, db]
+_totals = {}
+_lock = threading.Lock()
+# Callables returning {name: value} of further gauges, e.g. cache statistics
+_collectors = {}
+
+def record_run(run: NodeRun):
+    with _lock:
+        _runs.append(run)
+        totals = _totals.setdefault(run.node, [0, 0, 0.0, 0, 0.0, 0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += int(run.error)
+        totals[2] += run.wall_seconds
+        if run.ttft_seconds is not None:
+            totals[3] += 1
+            totals[4] += run.ttft_seconds
+        totals[5] += run.prompt_tokens
+        totals[6] += run.completion_tokens
+        totals[7] += run.db_seconds
+
+def recent_runs(node: str = None):
+    """Node runs in the ring buffer, oldest first."""
+    with _lock:
+        return [run for run in _runs if node is None or run.node == node]
+
+def instrument_node(name: str, fn):
+    """
+    Wrap an async graph node so every run is measured and recorded under ``name``.
+    The wrapper keeps the signature of ``fn``, so LangGraph still passes ``config``.
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        span = NodeSpan(name)
+        token = _current_span.set(span)
+        error = True
+        try:
+            result = await fn(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            _current_span.reset(token)
+            record_run(span.finish(error))
+    return wrapper
+
+@contextmanager
+def db_timer():
+    """Add the time spent inside the block to the DB time of the running node."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        span = _current_span.get()
+        if span is not None:
+            span.db_seconds += time.perf_counter() - start
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    """
+    Record time to first token and token usage of the chat model calls made by a node.
+    Usage reported by the model is used when present; otherwise tokens are counted locally.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._prompts = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        # Counted only after the call, and only if the model reports no usage, so the
+        # request is not delayed
+        if _current_span.get() is not None:
+            self._prompts[run_id] = messages
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        span = _current_span.get()
+        if span is not None:
+            span.first_token()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompts = self._prompts.pop(run_id, [])
+        span = _current_span.get()
+        if span is None:
+            return
+        # Not streamed: the whole answer is the first token
+        span.first_token()
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or usage
+        if usage:
+            span.prompt_tokens += usage.get("input_tokens", 0)
+            span.completion_tokens += usage.get("output_tokens", 0)
+        else:
+            span.prompt_tokens += sum(messages_token_count(batch, TELEMETRY_TOKEN_MODEL) for batch in prompts)
+            span.completion_tokens += sum(
+                token_count(generation.text, TELEMETRY_TOKEN_MODEL) for generations in response.generations for generation in generations
+            )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._prompts.pop(run_id, None)
+
+callback_handler = TelemetryCallbackHandler()
+
+def register_collector(name: str, collect):
+    """Export the numeric values of ``collect()`` as gauges named agent_<name>_<key>."""
+    _collectors[name] = collect
+
+def _quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def render_prometheus() -> str:
+    """Render the node metrics and registered gauges in Prometheus text format."""
+    with _lock:
+        runs = list(_runs)
+        totals = {node: list(values) for node, values in _totals.items()}
+    lines = []
+
+    def summary(metric, help_text, values_of, sum_index, count_index):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} summary")
+        for node in sorted(totals):
+            values = [value for value in (values_of(run) for run in runs if run.node == node) if value is not None]
+            for q in TELEMETRY_QUANTILES:
+                if values:
+                    lines.append(f'{metric}{{node="{node}",quantile="{q}"}} {_quantile(values, q):.6f}')
+            lines.append(f'{metric}_sum{{node="{node}"}} {totals[node][sum_index]:.6f}')
+            lines.append(f'{metric}_count{{node="{node}"}} {totals[node][count_index]}')
+
+    def counter(metric, help_text, index):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for node in sorted(totals):
+            lines.append(f'{metric}{{node="{node}"}} {totals[node][index]}')
+
+    summary("agent_node_duration_seconds", "Wall time of graph node runs.", lambda run: run.wall_seconds, 2, 0)
+    summary("agent_node_ttft_seconds", "Time from node start to the first model token.", lambda run: run.ttft_seconds, 4, 3)
+    summary("agent_node_db_seconds", "Time spent on database access per node run.", lambda run: run.db_seconds, 7, 0)
+    counter("agent_node_prompt_tokens_total", "Prompt tokens sent to the model.", 5)
+    counter("agent_node_completion_tokens_total", "Completion tokens received from the model.", 6)
+    counter("agent_node_errors_total", "Node runs that raised an exception.", 1)
+
+    for name, collect in sorted(_collectors.items()):
+        try:
+            values = collect()
+        except Exception as e:
+            print(f"Error collecting {name} metrics: {e}")
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metric = f"agent_{name}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,56 +1,83 @@
+import hashlib
 import os
+from functools import lru_cache
+
 import tiktoken
 from langchain.chat_models import init_chat_model
 from langchain.prompts import PromptTemplate
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
+from src.utils.cache import LRUCache
+from src.utils.prompts import prompt_registry
+
 def load_chat_model():
     OPENAI_API_BASE = os.environ.get("OPENAI_API_BASE")
     TEMPERATURE = os.environ.get("TEMPERATURE", "0.1")
     OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
     return init_chat_model(OPENAI_MODEL, model_provider="openai", base_url=OPENAI_API_BASE, temperature=float(TEMPERATURE))
 
-def messages_token_count(messages, model="gpt-4-turbo"):
-    encoding = tiktoken.encoding_for_model(model)
-    num_tokens = 0
+# Token counts of recently seen messages, keyed by model and content hash
+MESSAGE_TOKEN_CACHE_SIZE = int(os.environ.get("MESSAGE_TOKEN_CACHE_SIZE", "4096"))
+_message_token_counts = LRUCache(max_entries=MESSAGE_TOKEN_CACHE_SIZE, sizeof=lambda value: 0)
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """Return the tiktoken encoder of a model, created once per model."""
+    return tiktoken.encoding_for_model(model)
 
-    for message in messages:
-        content = message.content if message.content else ""
-        num_tokens += len(encoding.encode(content))
-    return num_tokens
+def message_token_count(message, model="gpt-4-turbo"):
+    content = message.content if message.content else ""
+    key = (model, hashlib.sha1(content.encode("utf-8")).digest())
+    count = _message_token_counts.get(key, count=False)
+    if count is None:
+        count = len(get_encoding(model).encode(content))
+        _message_token_counts.put(key, count)
+    return count
+
+def messages_token_count(messages, model="gpt-4-turbo"):
+    return sum(message_token_count(message, model) for message in messages)
 
 def token_count(text, model_name="gpt-4o"):
-    # Initialize the encoder for the specified model
-    encoder = tiktoken.encoding_for_model(model_name)
-    # Encode the text into tokens
-    tokens = encoder.encode(text)
-    # Return the number of tokens
-    return len(tokens)
+    # Encode the text into tokens with the cached encoder of the model
+    return len(get_encoding(model_name).encode(text))
+
+def truncate_to_tokens(text, max_tokens, model_name="gpt-4o"):
+    """Cut a text to at most max_tokens tokens of the model's encoding."""
+    tokens = get_encoding(model_name).encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return get_encoding(model_name).decode(tokens[:max_tokens])
 
 def read_prompt(state: str) -> str:
+    file_path = f"./src/prompts/{state}_prompt.txt"
     try:
-        file_path = f"./src/prompts/{state}_prompt.txt"
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        return content
+        return prompt_registry.text(file_path)
     except Exception as e:
         print(f"Error reading file {file_path}: {e}")
         return ""
 
+def read_prompt_template(state: str) -> PromptTemplate:
+    """Compiled template of ./src/prompts/<state>_prompt.txt, from the prompt registry."""
+    file_path = f"./src/prompts/{state}_prompt.txt"
+    try:
+        return prompt_registry.template(file_path)
+    except OSError as e:
+        print(f"Error reading file {file_path}: {e}")
+        return PromptTemplate.from_template("")
+
 def read_file_prompt(file_path: str) -> str:
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        return content
+        return prompt_registry.text(file_path)
     except Exception as e:
         print(f"Error reading file {file_path}: {e}")
         return ""
 
 def reasoning_prompt(prompt_path: str, **input_vars):
-    prompt_templ = read_file_prompt(prompt_path)
-    prompt = PromptTemplate(
-        template=prompt_templ, input_variables=list(input_vars.keys()),
-    )
+    try:
+        prompt = prompt_registry.template(prompt_path)
+    except Exception as e:
+        print(f"Error reading file {prompt_path}: {e}")
+        return ""
     message = prompt.format_prompt(**input_vars)
     return message.to_string()
 
@@ -74,7 +101,11 @@ def trim_messages_to_max_tokens(messages, model="gpt-4-turbo"):
         list: Trimmed list of messages.
     """
     max_token_size = int(os.environ.get("MAX_TOKEN_SIZE", 128_000))
-    trimmed_messages = list(messages)
-    while messages_token_count(trimmed_messages, model=model) > max_token_size and len(trimmed_messages) > 1:
-        trimmed_messages.pop(0)  # Remove the oldest message
-    return trimmed_messages
+    counts = [message_token_count(message, model) for message in messages]
+    total = sum(counts)
+    # Drop the oldest messages, keeping at least one, until the total fits
+    start = 0
+    while total > max_token_size and start < len(counts) - 1:
+        total -= counts[start]
+        start += 1
+    return list(messages[start:])
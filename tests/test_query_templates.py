@@ -0,0 +1,47 @@
+import pytest
+
+from src.db.query_templates import match_query_template, render_query
+
+@pytest.mark.parametrize("question, name, params", [
+    ("top 10 critical aws issues", "top_n", ("AWS", "CRITICAL", 10)),
+    ("What are the top 5 risks in my kubernetes cluster?", "top_n", ("KUBERNETES", 5)),
+    ("Show the highest risk vulnerabilities", "top_n", (10,)),
+    ("count by severity for containers", "severity_count", ("CONTAINER",)),
+    ("How many issues per severity?", "severity_count", ()),
+    ("which packages have CVE-2023-44487?", "finding_id", ("CVE-2023-44487", "CVE-2023-44487", 50)),
+    ("how do I fix KSV001", "finding_id", ("KSV001", "KSV001", 50)),
+    ("issues for eks:cloudwatch-agent-role", "resource_issues", ("eks:cloudwatch-agent-role", "%eks:cloudwatch-agent-role%", 50)),
+    ("show me findings on deployment/nginx", "resource_issues", ("deployment/nginx", "%deployment/nginx%", 50)),
+    ("vulnerabilities in the image nginx:1.25.", "resource_issues", ("nginx:1.25", "%nginx:1.25%", 50)),
+    ('issues for the role "admin"', "resource_issues", ("admin", "%admin%", 50)),
+])
+def test_matches(question, name, params):
+    match = match_query_template(question)
+    assert match is not None
+    assert (match.name, match.params) == (name, params)
+
+@pytest.mark.parametrize("question", [
+    "risks of running containers as root",
+    "issues in production",
+    "risks of privilege escalation",
+    "problems with RBAC",
+    "vulnerabilities in dev images",
+    "threats of ssrf",
+    "issues in aws",
+    "Why is the severity distribution like this per cluster?",
+    "Explain the top risks of using kubernetes",
+    "what is kubernetes?",
+    "summarize the scan",
+])
+def test_no_match(question):
+    assert match_query_template(question) is None
+
+def test_category_overrides_keywords():
+    match = match_query_template("top 3 issues in my cluster", "aws")
+    assert match.params == ("AWS", 3)
+
+def test_render_query_quotes_strings():
+    assert render_query("SELECT ? WHERE a = ?", ("it's", 5)) == "SELECT 'it''s' WHERE a = 5"
+
+def test_render_query_keeps_extra_placeholders():
+    assert render_query("SELECT ? WHERE a LIKE '%?%'", (1,)) == "SELECT 1 WHERE a LIKE '%?%'"
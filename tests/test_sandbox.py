@@ -0,0 +1,36 @@
+import sqlite3
+
+import pytest
+
+from src.db.sandbox import QuerySandbox
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE results (type TEXT, severity TEXT, risk_score REAL)")
+    conn.execute("CREATE TABLE secrets (value TEXT)")
+    conn.executemany("INSERT INTO results VALUES (?, ?, ?)", [("AWS", "HIGH", 7.5), ("CODE", "LOW", 2.0)])
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize("query", [
+    "SELECT type, upper(severity), round(avg(risk_score), 1) FROM results GROUP BY type",
+    "WITH high AS (SELECT * FROM results WHERE risk_score > 5) SELECT count(*) FROM high",
+    "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 3) "
+    "SELECT x, (SELECT count(*) FROM results WHERE risk_score > x) FROM n",
+])
+def test_allows_reads(conn, query):
+    assert QuerySandbox().validate(conn, query)
+
+@pytest.mark.parametrize("query", [
+    "SELECT * FROM secrets",
+    "SELECT load_extension('evil')",
+    "DELETE FROM results",
+    "WITH n AS (SELECT value FROM secrets) SELECT * FROM n",
+])
+def test_rejects(conn, query):
+    assert not QuerySandbox().validate(conn, query)
+
+def test_recursive_cte_runs(conn):
+    result = QuerySandbox().execute(conn, "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 3) SELECT x FROM n")
+    assert result.rows == [(1,), (2,), (3,)]